@@ -0,0 +1,206 @@
+import itertools
+import math
+import numpy as np
+
+# (pick label, sim_details probability field, odds key when the feed has a real price)
+PICK_MARKETS = (
+    ('MS 1', 'home_win_prob', 'home'),
+    ('MS X', 'draw_prob', None),
+    ('MS 2', 'away_win_prob', 'away'),
+    ('1.5 ÜST', 'over_1_5_prob', None),
+    ('2.5 ÜST', 'over_2_5_prob', None),
+    ('KG VAR', 'btts_prob', None),
+)
+
+# Bookmaker margin assumed when a market has no real price
+IMPLIED_MARGIN = 0.05
+# Picks below this probability (%) never enter the pool
+MIN_PICK_PROB = 50
+# Best picks (by objective) searched first; the pool doubles while constraints
+# leave fewer than the requested coupons, as long as it spans <= MAX_COMBINATIONS
+POOL_SIZE = 40
+MAX_COMBINATIONS = 2000000
+# Leg combinations scored per numpy batch
+BATCH_SIZE = 20000
+
+OBJECTIVES = ('ev', 'hit')
+
+
+def _price(value):
+    try:
+        price = float(value)
+    except (TypeError, ValueError):
+        return None
+    return price if price > 1.0 else None
+
+
+def collect_picks(matches, min_prob=MIN_PICK_PROB):
+    """Every (match, market) pick of open soccer matches with its probability and odds."""
+    picks = []
+    for m in matches:
+        if m.get('sport') != 'soccer' or m.get('status') == 'Completed':
+            continue
+        sim = (m.get('pro_stats') or {}).get('sim_details') or {}
+        odds = m.get('odds') or {}
+        for label, field, odds_key in PICK_MARKETS:
+            prob = (sim.get(field) or 0) / 100.0
+            if prob * 100 < min_prob or prob >= 1.0:
+                continue
+            price = _price(odds.get(odds_key)) if odds_key else None
+            source = 'market'
+            if price is None:
+                price = round(1.0 / (prob * (1 + IMPLIED_MARGIN)), 2)
+                source = 'implied'
+                if price <= 1.0:
+                    continue
+            picks.append({
+                'id': m.get('id'), 'home': m.get('home'), 'away': m.get('away'),
+                'league': m.get('league'), 'time': m.get('time'),
+                'pick': label, 'prob': round(prob * 100, 1), 'odds': price, 'odds_source': source,
+            })
+    return picks
+
+
+class AccumulatorOptimizer:
+    """
+    Best accumulators over a pick pool. Picks are scored in log space
+    (ev: log(p*o), hit: log p) so a coupon's score is the sum of its legs;
+    every leg but the last two is branched with score and odds bounds, and the
+    last two are scored in numpy batches.
+    """
+
+    def __init__(self, picks, objective='ev', pool_size=POOL_SIZE):
+        if objective not in OBJECTIVES:
+            raise ValueError(f"objective must be one of {OBJECTIVES}")
+        self.objective = objective
+        self.pool_size = pool_size
+
+        log_p = np.log([p['prob'] / 100.0 for p in picks]) if picks else np.zeros(0)
+        log_o = np.log([p['odds'] for p in picks]) if picks else np.zeros(0)
+        score = log_p + log_o if objective == 'ev' else log_p
+
+        # Pool = best picks, sorted by score so bounds can cut the first-leg loop
+        order = np.argsort(-score, kind='stable')
+        self.picks = [picks[i] for i in order]
+        self.score = score[order]
+        self.log_p = log_p[order]
+        self.log_o = log_o[order]
+        match_codes = {}
+        self.match_idx = np.array([match_codes.setdefault(p['id'], len(match_codes)) for p in self.picks], dtype=np.int32)
+        league_codes = {}
+        self.league_idx = np.array([league_codes.setdefault(p['league'], len(league_codes)) for p in self.picks], dtype=np.int32)
+
+    def _valid(self, combos, min_odds, max_per_league):
+        """Boolean mask of combos that satisfy all constraints."""
+        ok = self.log_o[combos].sum(axis=1) >= math.log(min_odds) - 1e-9
+        match_ids = self.match_idx[combos]
+        leagues = self.league_idx[combos]
+        legs = combos.shape[1]
+        for a, b in itertools.combinations(range(legs), 2):
+            ok &= match_ids[:, a] != match_ids[:, b]
+        if max_per_league is not None and legs > max_per_league:
+            # Legs sharing each leg's league (itself included)
+            same = (leagues[:, :, None] == leagues[:, None, :]).sum(axis=2)
+            ok &= same.max(axis=1) <= max_per_league
+        return ok
+
+    def optimize(self, legs=3, min_odds=1.0, max_per_league=None, top=3):
+        """Top `top` accumulators of exactly `legs` picks, best first."""
+        if legs < 1:
+            return []
+        n = min(self.pool_size, len(self.picks))
+        while True:
+            best = self._search(n, legs, min_odds, max_per_league, top)
+            grown = min(n * 2, len(self.picks))
+            if len(best) >= top or grown == n or math.comb(grown, legs) > MAX_COMBINATIONS:
+                break
+            n = grown
+        return [self._coupon(combo) for _, combo in best]
+
+    def _search(self, n, legs, min_odds, max_per_league, top):
+        """Branch-and-bound over the first n picks; [(score, combo)] best first."""
+        if n < legs:
+            return []
+        # No coupon can exist: too few matches, or leagues for the per-league cap
+        per_league = max_per_league if max_per_league is not None else legs
+        if (len(set(self.match_idx[:n].tolist())) < legs
+                or len(set(self.league_idx[:n].tolist())) * per_league < legs):
+            return []
+        score = self.score[:n]
+        log_o = self.log_o[:n]
+        min_log_odds = math.log(min_odds) - 1e-9
+        # The last two legs (pairs) are scored in numpy batches, the legs before them
+        # are branched one at a time; tails come ordered by their first index
+        tail = min(legs, 2)
+        head = legs - tail
+        tails = np.array(np.triu_indices(n, 1) if tail == 2 else [np.arange(n)], dtype=np.int32).T
+        tail_starts = np.searchsorted(tails[:, 0], np.arange(n + 1))
+        tail_score = score[tails].sum(axis=1)
+        tail_odds = log_o[tails].sum(axis=1)
+        # odds_bound[r][i]: highest log odds of r picks from i on (never rises with i)
+        odds_bound = np.full((legs + 1, n + 1), -np.inf)
+        odds_bound[0] = 0.0
+        for r in range(1, legs + 1):
+            for i in range(n - r, -1, -1):
+                odds_bound[r][i] = max(odds_bound[r][i + 1], log_o[i] + odds_bound[r - 1][i + 1])
+
+        best = []  # (score, combo tuple)
+        cutoff = -np.inf
+
+        def score_tails(prefix, p_score, p_odds, start):
+            nonlocal cutoff
+            for lo in range(tail_starts[start], len(tails), BATCH_SIZE):
+                hi = min(lo + BATCH_SIZE, len(tails))
+                scores = tail_score[lo:hi] + p_score
+                keep = np.flatnonzero((scores > cutoff) & (tail_odds[lo:hi] + p_odds >= min_log_odds))
+                if not len(keep):
+                    continue
+                combos = np.empty((len(keep), legs), dtype=np.int32)
+                combos[:, :head] = prefix
+                combos[:, head:] = tails[lo + keep]
+                scores = scores[keep]
+                idx = np.flatnonzero(self._valid(combos, min_odds, max_per_league))
+                if len(idx) > top:
+                    idx = idx[np.argpartition(-scores[idx], top - 1)[:top]]
+                best.extend((float(scores[i]), tuple(int(c) for c in combos[i])) for i in idx)
+                best.sort(key=lambda x: -x[0])
+                del best[top:]
+                if len(best) >= top:
+                    cutoff = best[-1][0]
+
+        def branch(prefix, p_score, p_odds, start):
+            if len(prefix) == head:
+                score_tails(prefix, p_score, p_odds, start)
+                return
+            r = legs - len(prefix)
+            used = {self.match_idx[j] for j in prefix}
+            leagues = [self.league_idx[j] for j in prefix]
+            for i in range(start, n - r + 1):
+                # Picks are sorted by score: the next r from i on are the best still reachable
+                if len(best) >= top and p_score + score[i:i + r].sum() <= cutoff:
+                    break
+                if p_odds + odds_bound[r][i] < min_log_odds:
+                    break
+                if self.match_idx[i] in used or leagues.count(self.league_idx[i]) >= per_league:
+                    continue
+                branch(prefix + [i], p_score + score[i], p_odds + log_o[i], i + 1)
+
+        branch([], 0.0, 0.0, 0)
+        return best
+
+    def _coupon(self, combo):
+        combo = list(combo)
+        total_odds = float(np.exp(self.log_o[combo].sum()))
+        hit_prob = float(np.exp(self.log_p[combo].sum()))
+        return {
+            'legs': [self.picks[i] for i in combo],
+            'total_odds': round(total_odds, 2),
+            'hit_prob': round(hit_prob * 100, 2),
+            'ev': round(hit_prob * total_odds, 3),
+        }
+
+
+def optimize_coupons(matches, legs=3, objective='ev', min_odds=1.0, max_per_league=None, top=3):
+    """Convenience wrapper: best accumulators straight from match dicts."""
+    return AccumulatorOptimizer(collect_picks(matches), objective=objective).optimize(
+        legs=legs, min_odds=min_odds, max_per_league=max_per_league, top=top)
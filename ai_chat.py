@@ -1,175 +1,78 @@
 import json
-import re
 from datetime import datetime
-import scraper_engine
+from chat_snapshot import ChatSnapshotCache, AnswerCache
+from chat_intents import parse_query, team_query
+from text_utils import search_tokens
+from session_store import create_session_store, MAX_SESSION_ID_LENGTH
 
 class MatchChatBot:
-    def __init__(self):
+    def __init__(self, match_snapshots=None):
         from db_manager import db_manager
+        if match_snapshots is None:
+            from match_snapshot import snapshot_cache as match_snapshots
         self.db_manager = db_manager
-        self.sessions = {} # Memory: sessionId -> last_filters
-        self.matches = []
+        self.sessions = create_session_store() # sessionId -> last_filters (bounded LRU + TTL)
+        # Immutable, indexed view of the current snapshot (shared by all threads); in
+        # multi-worker mode built from the shared snapshot file, not the DB
+        self.snapshots = ChatSnapshotCache(match_snapshots)
+        # Rendered replies per (snapshot version, filters); standings/h2h are never cached
+        self.answers = AnswerCache()
         self.load_data()
 
     def load_data(self):
+        """Current ChatSnapshot; rebuilt only when the DB generation changes."""
         try:
-            self.matches = self.db_manager.get_all_matches()
-            print(f"ChatBot Loaded {len(self.matches)} matches from DB.")
+            snap = self.snapshots.get()
         except Exception as e:
             print(f"ChatBot Load Error: {e}")
-            self.matches = []
+            return None
+        return snap
+
+    @property
+    def matches(self):
+        snap = self.snapshots.get()
+        return snap.matches
 
     def parse_query(self, query, last_filters=None):
         """
-        Parses Turkish natural language query.
+        Parses Turkish natural language query (one pass of the compiled intent matcher).
         Returns filters dict: { 'limit': 3, 'type': 'any', 'sort': 'confidence', 'league': 'all' }
         """
-        q = query.lower()
-        
-        # Determine if this is a follow-up / context query
-        is_follow_up = False
-        follow_up_keywords = ["peki", "peki ya", "sadece", "bunlardan", "bunların içinden", "hangileri", "başka"]
-        if any(w in q for w in follow_up_keywords) and last_filters:
-            is_follow_up = True
-
-        filters = {
-            'limit': 3,
-            'type': 'any',
-            'sort': 'confidence',
-            'min_prob': 0,
-            'league': 'all'
-        }
-
-        # If follow-up, inherit previous filters
-        if is_follow_up:
-            filters.update(last_filters)
-            # If "sadece" is used, we are likely refining by league
-            if "sadece" in q:
-                # Basic league detection (extendable)
-                leagues = {
-                    "ingiltere": "Premier League",
-                    "türkiye": "Trendyol Süper Lig",
-                    "ispanya": "LaLiga",
-                    "almanya": "Bundesliga",
-                    "italya": "Serie A",
-                    "fransa": "Ligue 1"
-                }
-                for k, v in leagues.items():
-                    if k in q: filters['league'] = v
-
-        # 1. EXTRACT LIMIT (e.g. "5 tane", "top 10", "tek maç")
-        # Look for numbers
-        num_match = re.search(r'(\d+)\s*(adet|tane|maç)?', q)
-        if num_match:
-            try:
-                # Avoid confusing "1.5" with limit 1 or 5
-                val = int(num_match.group(1))
-                if 0 < val < 20: filters['limit'] = val
-            except: pass
-        
-        if "tek maç" in q: filters['limit'] = 1
-
-        # 2. EXTRACT INTENT / TYPE
-        # "en gollü" -> high goal expectation (Sort by goals)
-        if "en gollü" in q or "bol gollü" in q:
-            filters['type'] = 'high_goals'
-            filters['sort'] = 'goals_desc'
-            return filters
-
-        # Over/Under
-        # "1.5 bitmeye" -> Implies Goal expectation (Over)
-        
-        is_under = "alt" in q or "under" in q
-        is_over = "üst" in q or "over" in q or "yüksek" in q or "gol" in q or "bitmeye" in q
-        
-        if "1.5" in q:
-            filters['type'] = "under_1_5" if is_under else "over_1_5"
-        elif "2.5" in q:
-             filters['type'] = "under_2_5" if is_under else "over_2_5"
-        elif "3.5" in q:
-             filters['type'] = "under_3_5" if is_under else "over_3_5"
-        elif is_over:
-             # Generic "üst" or "gol" without number -> Default 2.5
-             filters['type'] = "over_2_5"
-        elif is_under:
-             filters['type'] = "under_2_5"
-        
-        # BTTS (KG)
-        elif "kg var" in q or "karşılıklı gol" in q: filters['type'] = "btts_yes"
-        elif "kg yok" in q or "karşılıklı" in q: filters['type'] = "btts_no" # Catch 'karşılıklı yok'
-
-        # Side (Home/Away/Banko)
-        elif "banko" in q or "güvenilir" in q or "en iyi" in q:
-            filters['type'] = "banko"
-            filters['min_prob'] = 65
-        elif "sürpriz" in q or "süpriz" in q or "oranı yüksek" in q:
-            filters['type'] = "surprise"
-            filters['sort'] = 'odds_desc'
-            # Important: Clear min_prob if we are going for surprise
-            filters['min_prob'] = 0 
-
-        # Home/Away specific
-        elif "ev sahibi" in q or "ms 1" in q: filters['type'] = "home_win"
-        elif "deplasman" in q or "ms 2" in q: filters['type'] = "away_win"
-        
-        # 3. SPECIAL INTENTS (Standings / H2H)
-        if "puan durumu" in q or "sıralama" in q:
-            filters['type'] = 'standings'
-            # Detect league
-            leagues = {
-                "ingiltere": "eng.1", "türkiye": "tur.1", "ispanya": "esp.1",
-                "almanya": "ger.1", "italya": "ita.1", "fransa": "fra.1",
-                "süper lig": "tur.1", "premier lig": "eng.1"
-            }
-            for k, v in leagues.items():
-                if k in q: filters['target_league'] = v; break
-            if 'target_league' not in filters: filters['target_league'] = 'tur.1' # Default
-
-        elif "h2h" in q or "aralarındaki" in q or "son maçlar" in q:
-            filters['type'] = 'h2h'
-            # Target will be found in execute by matching names in the query
-
-        # 4. STRATEGIC INTENTS (Ordinaryüs Seviye)
-        if "kombine" in q or "kupon" in q or "kasa" in q:
-            filters['type'] = 'combo'
-            filters['limit'] = 3
-        elif "strateji" in q or "tavsiye" in q or "advisor" in q:
-            filters['type'] = 'strategy'
-
-        return filters
+        return parse_query(query, last_filters)
 
     def execute(self, query, session_id=None):
-        self.load_data() # Refresh cache
+        snap = self.snapshots.get()
         
         last_filters = None
-        if session_id and session_id in self.sessions:
-            last_filters = self.sessions[session_id].get('last_filters')
+        if session_id:
+            session_id = str(session_id)[:MAX_SESSION_ID_LENGTH]
+            session = self.sessions.get(session_id)
+            if session:
+                last_filters = session.get('last_filters')
             
         filters = self.parse_query(query, last_filters)
         
         # Save context
         if session_id:
-            self.sessions[session_id] = {'last_filters': filters}
+            self.sessions.set(session_id, {'last_filters': filters})
         
         # --- SPECIAL EXECUTION PATHS ---
         if filters['type'] == 'standings':
+            import scraper_engine
             data = scraper_engine.fetch_standings(filters['target_league'])
             return self.format_standings(data, filters['target_league'])
         
         if filters['type'] == 'h2h':
+            import scraper_engine
             # Find which match the user is talking about
-            target_match = None
-            for m in self.matches:
-                if m['home'].lower() in query.lower() or m['away'].lower() in query.lower():
-                    target_match = m; break
+            target_match = self.find_h2h_match(query)
             
             if target_match:
                 # Try to get SofaScore eventId
                 event_id = target_match.get('pro_stats', {}).get('sofa_elite', {}).get('id')
                 if not event_id:
                     # Try to find it via adapter
-                    from scraper_engine import sofa_adapter
-                    event_id = sofa_adapter.get_event_id(target_match['home'], target_match['away'])
+                    event_id = scraper_engine.get_sofa_adapter().get_event_id(target_match['home'], target_match['away'])
                 
                 if event_id:
                     h2h_data = scraper_engine.fetch_h2h_data(event_id)
@@ -179,114 +82,47 @@ class MatchChatBot:
             else:
                 return "Hangi maçın aralarındaki sonuçlarını merak ediyorsun? (Örn: 'Aston Villa Brighton son maçları')"
 
+        # Everything below depends only on the filters and the snapshot: rendered once per version
+        key = tuple(sorted(filters.items()))
+        return self.answers.get(snap.version, key, lambda: self.answer(snap, filters))
+
+    def find_h2h_match(self, query, candidates=10):
+        """
+        Fixture named in an h2h question: ranked FTS lookup on team names/aliases with the
+        intent words removed, then the candidate naming most of the remaining words wins,
+        upcoming/live matches before finished ones (bm25 order on ties).
+        """
+        words = team_query(query)
+        if not words:
+            return None
+        found = self.db_manager.search_matches(" ".join(words), limit=candidates, prefix=False,
+                                               columns=('home', 'away', 'aliases'))
+        if not found:
+            return None
+
+        def rank(m):
+            names = set(search_tokens(f"{m.get('home', '')} {m.get('away', '')}"))
+            return (-sum(w in names for w in words), m.get('status') not in ('Upcoming', 'Live'))
+        return min(found, key=rank)
+
+    def answer(self, snap, filters):
+        """Rendered HTML reply for parsed filters against one ChatSnapshot."""
         if filters['type'] == 'combo':
             # Strategy: Select 2-3 very high confidence matches
-            combo_matches = []
-            for m in self.matches:
-                ps = m.get('pro_stats', {})
-                if ps.get('best_goal_prob', 0) > 78 or "KASA" in m.get('recommendation', ''):
-                    combo_matches.append({'match': m, 'score': ps.get('best_goal_prob', 0)})
-            
-            combo_matches.sort(key=lambda x: x['score'], reverse=True)
-            return self.format_strategy_response(combo_matches[:3], "🔮 KAHİN: GÜNÜN ELMAS KOMBİNESİ")
+            return self.format_strategy_response(snap.combo[:3], "🔮 KAHİN: GÜNÜN ELMAS KOMBİNESİ")
 
         if filters['type'] == 'strategy':
             # Strategy: Mixed bag (1 Banko, 1 High Prob, 1 Value)
-            bankos = [m for m in self.matches if "KASA" in m.get('recommendation', '')]
-            overs = [m for m in self.matches if m.get('pro_stats', {}).get('best_goal_prob', 0) > 75]
-            surprises = [m for m in self.matches if float(m['odds']['home'] or 0) > 2.5 or float(m['odds']['away'] or 0) > 2.5]
-            
             strat_results = []
-            if bankos: strat_results.append({'match': bankos[0], 'score': 100})
-            if overs: strat_results.append({'match': overs[0], 'score': 90})
-            if surprises: strat_results.append({'match': surprises[0], 'score': 50})
+            if snap.bankos: strat_results.append({'match': snap.bankos[0], 'score': 100})
+            if snap.overs: strat_results.append({'match': snap.overs[0], 'score': 90})
+            if snap.surprises: strat_results.append({'match': snap.surprises[0], 'score': 50})
             
             return self.format_strategy_response(strat_results, "ORDINARYÜS: KARMA ANALİZ STRATEJİSİ")
 
-        results = []
-
-        for m in self.matches:
-            # Safely get stats
-            ps = m.get('pro_stats', {})
-            rec = m.get('recommendation', '')
-            
-            # --- FILTERING LOGIC ---
-            
-            # 1. Banko / General Confidence
-            if filters['type'] == 'banko':
-                # Must be a recommended pick or high prob
-                valid = False
-                if "KASA" in rec or "BANKO" in rec: valid = True
-                if ps.get('best_goal_prob', 0) > 70: valid = True
-                if not valid: continue
-            
-            # 2. Over/Under
-            elif filters['type'].startswith('over_'):
-                pick = ps.get('best_goal_pick', '')
-                if filters['type'] == 'over_1_5' and ("1.5 ÜST" in pick or "2.5 ÜST" in pick or "3.5 ÜST" in pick): pass
-                elif filters['type'] == 'over_2_5' and ("2.5 ÜST" in pick or "3.5 ÜST" in pick): pass
-                elif filters['type'] == 'over_3_5' and "3.5 ÜST" in pick: pass
-                else: continue
-            
-            elif filters['type'].startswith('under_'):
-                 pick = ps.get('best_goal_pick', '')
-                 if "ALT" not in pick: continue
-            
-            # 3. High Goals (Sort only, weak filter)
-            elif filters['type'] == 'high_goals':
-                if ps.get('total_goals_prediction', 0) < 2.0: continue
-
-            # 4. BTTS
-            elif filters['type'] == 'btts_yes':
-                if "KG VAR" not in ps.get('best_goal_pick', ''): continue
-            elif filters['type'] == 'btts_no':
-                if "KG YOK" not in ps.get('best_goal_pick', ''): continue
-
-            # 5. Surprise
-            elif filters['type'] == 'surprise':
-                # Look for odds > 2.00
-                try:
-                    h_o = float(m['odds']['home'])
-                    a_o = float(m['odds']['away'])
-                    if h_o < 2.0 and a_o < 2.0: continue
-                except: continue
-
-            # 6. Side
-            elif filters['type'] == 'home_win':
-                if "MS 1" not in rec: continue
-            elif filters['type'] == 'away_win':
-                if "MS 2" not in rec: continue
-
-            # 7. League Filter
-            if filters.get('league') != 'all':
-                if filters['league'].lower() not in m.get('league', '').lower(): continue
-
-            # ADD TO RESULTS
-            # Calculate a "Score" for sorting
-            score = 0
-            
-            if filters.get('sort') == 'goals_desc':
-                score = ps.get('total_goals_prediction', 0)
-            else:
-                # Use Reliability/Confidence
-                if "KASA" in rec: score += 100
-                elif "BANKO" in rec: score += 80
-                score += ps.get('best_goal_prob', 50)
-            
-            results.append({
-                'match': m,
-                'score': score
-            })
-
-        # --- SORTING ---
-        if filters.get('sort') == 'odds_desc':
-            # Sort by max of home/away odds
-            results.sort(key=lambda x: max(float(x['match']['odds']['home'] or 0), float(x['match']['odds']['away'] or 0)), reverse=True)
-        else:
-            results.sort(key=lambda x: x['score'], reverse=True)
-        
-        # --- LIMIT ---
-        final_list = results[:filters['limit']]
+        # Prebuilt per-type ranking, league filter on folded league-name tokens
+        final_list = snap.select(filters['type'], sort=filters.get('sort'),
+                                 league=filters.get('league', 'all'), limit=filters['limit'])
         
         return self.format_response(final_list, filters)
 
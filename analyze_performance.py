@@ -13,9 +13,10 @@ def parse_stake(prediction_str):
 
 def analyze():
     try:
-        df = pd.read_csv("training_data.csv")
+        from training_store import get_training_store
+        df = get_training_store().to_dataframe()
     except Exception as e:
-        print(f"Error reading CSV: {e}")
+        print(f"Error reading training data: {e}")
         return
 
     print(f"Total Matches in History: {len(df)}")
@@ -44,8 +45,8 @@ def analyze():
         if "MS 1" in str(row['prediction']): odds = float(row['home_odds'])
         elif "MS 2" in str(row['prediction']): odds = float(row['away_odds'])
         # Simplified: defaulting to match winner odds for analysis if type not clear
-        # But our CSV usually logs the odds relevant to the bet? 
-        # Actually checking the CSV structure:
+        # But our store usually logs the odds relevant to the bet? 
+        # Actually checking the sample structure:
         # home_odds, away_odds are listed.
         # The prediction column says "MS 1", "MS 2", etc.
         
@@ -1,16 +1,31 @@
 import json
+import math
 import os
-from flask import Flask, render_template, request, jsonify
-import scraper_engine
+import threading
+from flask import Flask, Response, render_template, request, jsonify
 
 app = Flask(__name__)
 
 CACHE_FILE = "matches_cache.json"
 
-from db_manager import db_manager
+from db_manager import db_manager, PICK_MARKETS, PICK_STATS_GROUPS
+from match_snapshot import snapshot_cache
+from response_cache import response_cache
+from event_stream import stream_match_events, acquire_stream_slot, release_stream_slot
+from singleflight import SingleFlightCache
+from snapshot_file import SHARED_SNAPSHOT, shared_snapshot, SharedSnapshotSource
+
+# Snapshots for routes that need decoded matches: the mmapped file in multi-worker
+# mode (no per-worker rebuild from the DB), the local cache otherwise
+match_snapshots = SharedSnapshotSource(shared_snapshot, snapshot_cache) if SHARED_SNAPSHOT else snapshot_cache
+
+def shared_body(key):
+    # Multi-worker mode: prebuilt bodies straight from the mmapped snapshot file
+    return shared_snapshot.body(key) if SHARED_SNAPSHOT else None
 
 def load_cached_matches():
-    return db_manager.get_active_matches()
+    # Decoded once per snapshot version; request threads only read it
+    return match_snapshots.get().active
 
 @app.route('/')
 def dashboard():
@@ -20,28 +35,119 @@ def dashboard():
 @app.route('/api/fixtures')
 def api_fixtures():
     sport_filter = request.args.get('sport') # 'soccer' or 'basketball'
-    matches = load_cached_matches()
-    
-    if sport_filter:
-        matches = [m for m in matches if m.get('sport') == sport_filter]
-        
-    return jsonify(matches)
+    body = shared_body(f"fixtures:{sport_filter or ''}")
+    if body is not None:
+        resp = response_cache.send(body)
+        resp.headers['X-Generation'] = str(shared_snapshot.get().generation)
+        return resp
+    snap = snapshot_cache.get()
+    # ETag + precompressed body per snapshot version and filter (304 when unchanged)
+    resp = response_cache.respond(snap.version, ('fixtures', sport_filter),
+                                  lambda: snap.fixtures(sport_filter))
+    # Starting point for /api/stream (lastEventId)
+    resp.headers['X-Generation'] = str(snap.generation)
+    return resp
+
+@app.route('/api/stream')
+def api_stream():
+    # Server-Sent Events: live match deltas instead of polling /api/fixtures
+    sport_filter = request.args.get('sport')
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('lastEventId')
+    if not acquire_stream_slot():
+        # EventSource gives up on a non-200; the dashboard falls back to 30s polling
+        return jsonify({'error': 'too many live streams'}), 503, {'Retry-After': '30'}
+    resp = Response(stream_match_events(match_snapshots, sport_filter, last_id),
+                    mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Also runs when the client disconnects before the generator starts
+    resp.call_on_close(release_stream_slot)
+    return resp
 
 HISTORY_CACHE_FILE = "history_cache.json"
 
 @app.route('/api/history')
 def api_history():
     sport_filter = request.args.get('sport')
-    # Use ALL matches from DB for history, filtering by Finished status
-    all_matches = db_manager.get_all_matches() 
-    history_matches = [m for m in all_matches if m.get('status') == 'Finished' or m.get('result') != 'pending']
-    
-    if sport_filter:
-        history_matches = [m for m in history_matches if m.get('sport') == sport_filter]
-    return jsonify(history_matches)
-
-from ai_chat import MatchChatBot
-chatbot = MatchChatBot()
+    body = shared_body(f"history:{sport_filter or ''}")
+    if body is not None:
+        return response_cache.send(body)
+    # Finished matches from the hot table plus the archive
+    snap = snapshot_cache.get()
+    return response_cache.respond(snap.version, ('history', sport_filter),
+                                  lambda: snap.history_for(sport_filter))
+
+HISTORY_PAGE_ARGS = ('sport', 'league', 'from', 'to', 'result', 'market', 'cursor', 'limit', 'fields', 'full')
+
+@app.route('/api/history/page')
+def api_history_page():
+    # Keyset-paginated history: ?limit=50&cursor=<next_cursor>&sport=&league=a,b&from=YYYY-MM-DD&to=
+    #                           &market=MS|GOAL|PROPS&result=won|lost&fields=id,home,away&full=1
+    args = {k: request.args.get(k) for k in HISTORY_PAGE_ARGS}
+    market = (args['market'] or '').upper() or None
+    if market and market not in PICK_MARKETS:
+        return jsonify({'error': f"market must be one of {', '.join(PICK_MARKETS)}"}), 400
+    snap = match_snapshots.get()
+
+    def build():
+        matches, next_cursor = db_manager.get_history_page(
+            limit=request.args.get('limit', 50, type=int),
+            cursor=args['cursor'],
+            sport=args['sport'],
+            league=args['league'],
+            date_from=args['from'],
+            date_to=args['to'],
+            result=args['result'],
+            market=market,
+            full=args['full'] == '1'
+        )
+        if args['fields']:
+            fields = [f.strip() for f in args['fields'].split(',') if f.strip()]
+            matches = [{k: m.get(k) for k in fields} for m in matches]
+        return {"matches": matches, "next_cursor": next_cursor}
+
+    return response_cache.respond(snap.version, ('history_page',) + tuple(sorted(args.items())), build)
+
+@app.route('/api/stats')
+def api_stats():
+    # Success-rate aggregates: ?sport=&league=&market=MS|GOAL|PROPS&days=&group=league,market
+    group_by = tuple(g.strip() for g in request.args.get('group', 'league,market').split(',') if g.strip())
+    unknown = [g for g in group_by if g not in PICK_STATS_GROUPS]
+    if unknown:
+        return jsonify({'error': f"group must be a subset of {', '.join(PICK_STATS_GROUPS)}"}), 400
+    market = (request.args.get('market') or '').upper() or None
+    if market and market not in PICK_MARKETS:
+        return jsonify({'error': f"market must be one of {', '.join(PICK_MARKETS)}"}), 400
+    report = db_manager.get_pick_stats(
+        sport=request.args.get('sport'),
+        league=request.args.get('league'),
+        market=market,
+        days=request.args.get('days', type=int),
+        group_by=group_by
+    )
+    return jsonify(report)
+
+SEARCH_FIELDS = ('id', 'sport', 'league', 'home', 'away', 'time', 'status', 'score', 'recommendation')
+
+@app.route('/api/search')
+def api_search():
+    # Ranked team/league/pick lookup: ?q=fenerbahce&sport=soccer&limit=10
+    query = request.args.get('q', '')
+    limit = min(request.args.get('limit', 10, type=int), 50)
+    results = db_manager.search_matches(query, limit=limit, sport=request.args.get('sport'))
+    return jsonify([{k: m.get(k) for k in SEARCH_FIELDS} for m in results])
+
+# Chatbot (and its snapshot/session store) is built by the first chat request
+_chatbot = None
+_chatbot_lock = threading.Lock()
+
+def get_chatbot():
+    global _chatbot
+    if _chatbot is None:
+        with _chatbot_lock:
+            if _chatbot is None:
+                from ai_chat import MatchChatBot
+                _chatbot = MatchChatBot(match_snapshots)
+    return _chatbot
 
 @app.route('/api/chat', methods=['POST'])
 def api_chat():
@@ -52,91 +158,71 @@ def api_chat():
     if not message:
         return jsonify({'response': "Lütfen bir şeyler yazın."})
     
-    response_html = chatbot.execute(message, session_id=session_id)
+    response_html = get_chatbot().execute(message, session_id=session_id)
     return jsonify({'response': response_html})
 
+def load_standings(league_code):
+    import scraper_engine  # requests/cloudscraper stack, only for upstream refreshes
+    # fetch_standings memoizes forever (failures too); drop it so a refresh hits ESPN
+    scraper_engine.STANDINGS_CACHE.pop(league_code, None)
+    return scraper_engine.fetch_standings(league_code)
+
+def load_h2h(event_id, home, away):
+    import scraper_engine
+    return scraper_engine.fetch_h2h_data(event_id, home=home, away=away)
+
+# Upstream calls coalesced per key; stale values are served while one refresh runs
+standings_cache = SingleFlightCache(load_standings, ttl=30 * 60, stale_ttl=6 * 3600, name="Puan durumu")
+h2h_cache = SingleFlightCache(load_h2h, ttl=6 * 3600, stale_ttl=24 * 3600, name="H2H")
+
+@app.route('/api/chat/stats')
+def api_chat_stats():
+    # Reply cache hit rate and session store size/evictions
+    chatbot = get_chatbot()
+    return jsonify({'answers': chatbot.answers.info(), 'sessions': chatbot.sessions.info()})
+
 @app.route('/api/standings/<league_code>')
 def api_standings(league_code):
-    data = scraper_engine.fetch_standings(league_code)
+    data = standings_cache.get(league_code)
     return jsonify(data)
 
 @app.route('/api/h2h/<event_id>')
 def api_h2h(event_id):
     home = request.args.get('home')
     away = request.args.get('away')
-    data = scraper_engine.fetch_h2h_data(event_id, home=home, away=away)
+    data = h2h_cache.get(event_id, home, away)
     return jsonify(data)
 
 @app.route('/api/coupons')
 def api_coupons():
-    matches = load_cached_matches()
-    # Filter only soccer matches and only upcoming/live
-    soccer_matches = [m for m in matches if m.get('sport') == 'soccer' and m.get('status') != 'Completed']
-    
-    if not soccer_matches:
-        return jsonify([])
-
-    used_ids = set()
-    
-    def get_best_for_market(market_key, min_prob=70):
-        best_match = None
-        best_prob = 0
-        
-        for m in soccer_matches:
-            if m['id'] in used_ids: continue
-            
-            pro = m.get('pro_stats', {})
-            sim = pro.get('sim_details', {})
-            
-            prob = 0
-            if market_key == '1.5_UST': prob = sim.get('over_1_5_prob', 0)
-            elif market_key == '2.5_UST': prob = sim.get('over_2_5_prob', 0)
-            elif market_key == 'KG_VAR': prob = sim.get('btts_prob', 0)
-            elif market_key == 'MS': 
-                # Highest winning prob (either home or away)
-                h_p = sim.get('home_win_prob', 0)
-                a_p = sim.get('away_win_prob', 0)
-                prob = max(h_p, a_p)
-            
-            if prob > min_prob and prob > best_prob:
-                best_prob = prob
-                best_match = m
-        
-        if best_match:
-            used_ids.add(best_match['id'])
-            # Add specific market info to the returned match
-            market_map = {
-                '1.5_UST': '1.5 ÜST',
-                '2.5_UST': '2.5 ÜST',
-                'KG_VAR': 'KG VAR',
-                'MS': 'MS 1' if sim.get('home_win_prob', 0) > sim.get('away_win_prob', 0) else 'MS 2'
-            }
-            best_match['coupon_pick'] = market_map[market_key]
-            best_match['coupon_prob'] = int(best_prob)
-            
-        return best_match
-
-    # Generate 3 Unique Coupons
-    coupons = []
-    for i in range(3):
-        coupon = []
-        # Try to pick one from each category for each coupon
-        for cat in ['1.5_UST', '2.5_UST', 'KG_VAR', 'MS']:
-            m = get_best_for_market(cat, min_prob=65)
-            if m:
-                # We need to copy to avoid mutation issues if same match is picked (though used_ids prevents it)
-                m_copy = json.loads(json.dumps(m))
-                coupon.append(m_copy)
-        
-        if coupon:
-            coupons.append({
-                "id": i + 1,
-                "name": f"KAHİN KUPONU #{i+1}",
-                "matches": coupon,
-                "total_odds": round(sum([float(x.get('odds', {}).get('home', 1.5)) for x in coupon]) / len(coupon) * 2.5, 2) # Mock odds calc
-            })
-            
-    return jsonify(coupons)
+    body = shared_body("coupons")
+    if body is not None:
+        return response_cache.send(body)
+    snap = snapshot_cache.get()
+    return response_cache.respond(snap.version, ('coupons',), lambda: snap.coupons)
+
+MAX_MIN_ODDS = 50.0
+
+@app.route('/api/coupons/optimized')
+def api_coupons_optimized():
+    # Best accumulators: ?legs=3&objective=ev|hit&min_odds=2.0&max_per_league=1&top=3
+    legs = max(1, min(request.args.get('legs', 3, type=int), 6))
+    objective = request.args.get('objective', 'ev')
+    if objective not in ('ev', 'hit'):
+        return jsonify({'error': "objective must be 'ev' or 'hit'"}), 400
+    # Snapped to a 0.05 grid and capped, so arbitrary floats don't each get a cache entry and optimizer run
+    min_odds = request.args.get('min_odds', 1.0, type=float)
+    min_odds = round(min(max(min_odds, 1.0), MAX_MIN_ODDS) * 20) / 20 if math.isfinite(min_odds) else 1.0
+    max_per_league = request.args.get('max_per_league', type=int)
+    if max_per_league is not None:
+        max_per_league = max(1, min(max_per_league, legs))
+    top = max(1, min(request.args.get('top', 3, type=int), 10))
+    from accumulator_optimizer import optimize_coupons  # numpy, only for this route
+    snap = match_snapshots.get()
+    return response_cache.respond(
+        snap.version, ('coupons_optimized', legs, objective, min_odds, max_per_league, top),
+        lambda: optimize_coupons(snap.active, legs=legs, objective=objective, min_odds=min_odds,
+                                 max_per_league=max_per_league, top=top))
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0')
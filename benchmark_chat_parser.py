@@ -0,0 +1,190 @@
+import re
+import sys
+import time
+from chat_intents import parse_query
+
+# Real chat queries (dashboard + Telegram logs), follow-ups included
+CORPUS = [
+    "Bana 3 tane banko maç ver", "banko", "bugünün en iyi maçları", "güvenilir 5 maç",
+    "5 tane 2.5 üst", "2.5 alt biter mi", "1.5 üst maçlar", "3.5 üst olur mu", "3.5 alt",
+    "bugün 1.5 bitmeye aday maçlar", "gollü maçlar", "en gollü 4 maç", "bol gollü maç var mı",
+    "kg var", "karşılıklı gol olur mu", "kg yok maçlar", "karşılıklı yok", "under 2.5", "over",
+    "sürpriz maçlar", "süpriz 2 maç", "oranı yüksek maçlar", "ev sahibi kazanır", "ms 1 banko",
+    "ms 2", "deplasman favori", "deplasman takımı kazanır mı", "tek maç ver", "tek maç banko",
+    "10 tane maç", "top 10", "25 maç", "0 maç", "puan durumu", "ingiltere puan durumu",
+    "süper lig sıralama", "premier lig puan durumu", "ispanya sıralama", "almanya puan durumu",
+    "fenerbahçe galatasaray h2h", "aston villa brighton son maçları", "aralarındaki maçlar",
+    "kombine yap", "bugün kupon yap", "kasa kuponu", "strateji ver", "tavsiye", "advisor mode",
+    "peki sadece ingiltere", "peki ya ispanya", "sadece türkiye", "sadece italya ve fransa",
+    "bunlardan hangileri üst", "bunların içinden 2 tane", "başka maç var mı", "hangileri banko",
+    "peki 2.5 üst", "peki sadece almanya 3 tane", "merhaba", "nasılsın", "Maltepe maçı",
+    "YÜKSEK ORANLI maçlar", "İSTANBUL derbisi", "11.5 üst", "ms 12", "1.55 oran", "sıralama ve kupon",
+    "puan durumu kombine", "h2h ve strateji", "kg var 2.5 üst", "banko sürpriz", "en iyi deplasman",
+]
+
+LAST_FILTERS = [
+    None,
+    {'limit': 5, 'type': 'over_2_5', 'sort': 'confidence', 'min_prob': 0, 'league': 'all'},
+    {'limit': 3, 'type': 'high_goals', 'sort': 'goals_desc', 'min_prob': 0, 'league': 'La Liga'},
+    {'limit': 3, 'type': 'standings', 'sort': 'confidence', 'min_prob': 0, 'league': 'all', 'target_league': 'esp.1'},
+]
+
+
+# --- LEGACY PARSER (reference copy of the original keyword chain) ---
+def legacy_parse_query(query, last_filters=None):
+    """
+    Parses Turkish natural language query.
+    Returns filters dict: { 'limit': 3, 'type': 'any', 'sort': 'confidence', 'league': 'all' }
+    """
+    q = query.lower()
+
+    # Determine if this is a follow-up / context query
+    is_follow_up = False
+    follow_up_keywords = ["peki", "peki ya", "sadece", "bunlardan", "bunların içinden", "hangileri", "başka"]
+    if any(w in q for w in follow_up_keywords) and last_filters:
+        is_follow_up = True
+
+    filters = {
+        'limit': 3,
+        'type': 'any',
+        'sort': 'confidence',
+        'min_prob': 0,
+        'league': 'all'
+    }
+
+    # If follow-up, inherit previous filters
+    if is_follow_up:
+        filters.update(last_filters)
+        # If "sadece" is used, we are likely refining by league
+        if "sadece" in q:
+            # Basic league detection (extendable)
+            leagues = {
+                "ingiltere": "Premier League",
+                "türkiye": "Süper Lig",
+                "ispanya": "La Liga",
+                "almanya": "Bundesliga",
+                "italya": "Serie A",
+                "fransa": "Ligue 1"
+            }
+            for k, v in leagues.items():
+                if k in q: filters['league'] = v
+
+    # 1. EXTRACT LIMIT (e.g. "5 tane", "top 10", "tek maç")
+    # Look for numbers
+    num_match = re.search(r'(\d+)\s*(adet|tane|maç)?', q)
+    if num_match:
+        try:
+            # Avoid confusing "1.5" with limit 1 or 5
+            val = int(num_match.group(1))
+            if 0 < val < 20: filters['limit'] = val
+        except: pass
+
+    if "tek maç" in q: filters['limit'] = 1
+
+    # 2. EXTRACT INTENT / TYPE
+    # "en gollü" -> high goal expectation (Sort by goals)
+    if "en gollü" in q or "bol gollü" in q:
+        filters['type'] = 'high_goals'
+        filters['sort'] = 'goals_desc'
+        return filters
+
+    # Over/Under
+    # "1.5 bitmeye" -> Implies Goal expectation (Over)
+
+    is_under = "alt" in q or "under" in q
+    is_over = "üst" in q or "over" in q or "yüksek" in q or "gol" in q or "bitmeye" in q
+
+    if "1.5" in q:
+        filters['type'] = "under_1_5" if is_under else "over_1_5"
+    elif "2.5" in q:
+         filters['type'] = "under_2_5" if is_under else "over_2_5"
+    elif "3.5" in q:
+         filters['type'] = "under_3_5" if is_under else "over_3_5"
+    elif is_over:
+         # Generic "üst" or "gol" without number -> Default 2.5
+         filters['type'] = "over_2_5"
+    elif is_under:
+         filters['type'] = "under_2_5"
+
+    # BTTS (KG)
+    elif "kg var" in q or "karşılıklı gol" in q: filters['type'] = "btts_yes"
+    elif "kg yok" in q or "karşılıklı" in q: filters['type'] = "btts_no" # Catch 'karşılıklı yok'
+
+    # Side (Home/Away/Banko)
+    elif "banko" in q or "güvenilir" in q or "en iyi" in q:
+        filters['type'] = "banko"
+        filters['min_prob'] = 65
+    elif "sürpriz" in q or "süpriz" in q or "oranı yüksek" in q:
+        filters['type'] = "surprise"
+        filters['sort'] = 'odds_desc'
+        # Important: Clear min_prob if we are going for surprise
+        filters['min_prob'] = 0 
+
+    # Home/Away specific
+    elif "ev sahibi" in q or "ms 1" in q: filters['type'] = "home_win"
+    elif "deplasman" in q or "ms 2" in q: filters['type'] = "away_win"
+
+    # 3. SPECIAL INTENTS (Standings / H2H)
+    if "puan durumu" in q or "sıralama" in q:
+        filters['type'] = 'standings'
+        # Detect league
+        leagues = {
+            "ingiltere": "eng.1", "türkiye": "tur.1", "ispanya": "esp.1",
+            "almanya": "ger.1", "italya": "ita.1", "fransa": "fra.1",
+            "süper lig": "tur.1", "premier lig": "eng.1"
+        }
+        for k, v in leagues.items():
+            if k in q: filters['target_league'] = v; break
+        if 'target_league' not in filters: filters['target_league'] = 'tur.1' # Default
+
+    elif "h2h" in q or "aralarındaki" in q or "son maçlar" in q:
+        filters['type'] = 'h2h'
+        # Target will be found in execute by matching names in the query
+
+    # 4. STRATEGIC INTENTS (Ordinaryüs Seviye)
+    if "kombine" in q or "kupon" in q or "kasa" in q:
+        filters['type'] = 'combo'
+        filters['limit'] = 3
+    elif "strateji" in q or "tavsiye" in q or "advisor" in q:
+        filters['type'] = 'strategy'
+
+    return filters
+
+
+def check_equivalence():
+    mismatches = []
+    for q in CORPUS:
+        for last in LAST_FILTERS:
+            old = legacy_parse_query(q, dict(last) if last else last)
+            new = parse_query(q, dict(last) if last else last)
+            if old != new:
+                mismatches.append((q, last, old, new))
+    return mismatches
+
+
+def bench(parse, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for q in CORPUS:
+            parse(q, LAST_FILTERS[1])
+    return (time.perf_counter() - start) / (rounds * len(CORPUS)) * 1e6
+
+
+def run_benchmark(rounds=200):
+    mismatches = check_equivalence()
+    for q, last, old, new in mismatches:
+        print(f"❌ '{q}' (son filtre: {last})\n   eski: {old}\n   yeni: {new}")
+    print(f"Eşdeğerlik: {len(CORPUS) * len(LAST_FILTERS) - len(mismatches)}/{len(CORPUS) * len(LAST_FILTERS)} aynı")
+
+    old_us = bench(legacy_parse_query, rounds)
+    new_us = bench(parse_query, rounds)
+    print(f"{'Parser':<22}{'µs/sorgu':>10}")
+    print(f"{'Eski anahtar zinciri':<22}{old_us:>10.1f}")
+    print(f"{'Derlenmiş eşleştirici':<22}{new_us:>10.1f}")
+    print(f"Hızlanma: x{old_us / new_us:.1f}")
+    return not mismatches
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sys.exit(0 if run_benchmark(rounds) else 1)
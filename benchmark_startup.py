@@ -0,0 +1,52 @@
+import json
+import statistics
+import subprocess
+import sys
+
+# Modules that should only be imported on the paths that need them
+HEAVY_MODULES = ('pandas', 'sklearn', 'joblib', 'cloudscraper')
+
+# name -> code run in a fresh interpreter
+SCENARIOS = (
+    ("import app", "import app"),
+    ("import scraper_engine", "import scraper_engine"),
+    ("import data_fetcher", "import data_fetcher"),
+    # What `import app` used to do eagerly: chatbot, engines, cloudscraper session
+    ("app + eski açılış işleri", "import app, scraper_engine; app.get_chatbot(); "
+                                 "scraper_engine.get_stat_engine(); scraper_engine.get_sofa_adapter().scraper"),
+)
+
+PROBE = """
+import sys, time
+start = time.perf_counter()
+{code}
+elapsed = (time.perf_counter() - start) * 1000
+import json
+print(json.dumps({{'ms': elapsed, 'heavy': [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+
+def measure(code, rounds):
+    """Median import time (ms) over fresh interpreters, plus the heavy modules it loaded."""
+    times = []
+    heavy = []
+    for _ in range(rounds):
+        out = subprocess.run([sys.executable, "-c", PROBE.format(code=code, heavy=HEAVY_MODULES)],
+                             capture_output=True, text=True, check=True).stdout
+        result = json.loads(out.strip().splitlines()[-1])
+        times.append(result['ms'])
+        heavy = result['heavy']
+    return statistics.median(times), heavy
+
+
+def run_benchmark(rounds=5):
+    print(f"🚀 Soğuk başlangıç ({rounds} yeni süreç, medyan)\n")
+    print(f"{'Senaryo':<28}{'ms':>9}  Ağır modüller")
+    for name, code in SCENARIOS:
+        ms, heavy = measure(code, rounds)
+        print(f"{name:<28}{ms:>9.1f}  {', '.join(heavy) or '-'}")
+
+
+if __name__ == "__main__":
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    run_benchmark(rounds)
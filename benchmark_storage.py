@@ -0,0 +1,51 @@
+import os
+import sqlite3
+import sys
+import time
+from db_manager import DB_PATH, encode_prediction, decode_prediction
+
+def load_matches(db_path):
+    conn = sqlite3.connect(db_path)
+    rows = conn.execute("SELECT prediction_json FROM matches").fetchall()
+    conn.close()
+    return [decode_prediction(r[0]) for r in rows]
+
+def bench(matches, compact, rounds=20):
+    blobs = [encode_prediction(m, compact) for m in matches]
+    size = sum(len(b.encode('utf-8')) if isinstance(b, str) else len(b) for b in blobs)
+    
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for b in blobs:
+            decode_prediction(b)
+    decode_ms = (time.perf_counter() - start) / rounds * 1000
+    
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for m in matches:
+            encode_prediction(m, compact)
+    encode_ms = (time.perf_counter() - start) / rounds * 1000
+    return size, encode_ms, decode_ms
+
+def run_benchmark(db_path=DB_PATH):
+    """Compares the legacy JSON text format with the compact format on the real DB rows."""
+    if not os.path.exists(db_path):
+        print(f"❌ {db_path} not found!")
+        return
+
+    matches = load_matches(db_path)
+    if not matches:
+        print("No matches stored yet.")
+        return
+    print(f"📦 {len(matches)} matches from {db_path}\n")
+
+    j_size, j_enc, j_dec = bench(matches, compact=False)
+    c_size, c_enc, c_dec = bench(matches, compact=True)
+
+    print(f"{'FORMAT':<10}{'SIZE (KB)':>12}{'ENCODE (ms)':>14}{'DECODE (ms)':>14}")
+    print(f"{'json':<10}{j_size / 1024:>12.1f}{j_enc:>14.2f}{j_dec:>14.2f}")
+    print(f"{'compact':<10}{c_size / 1024:>12.1f}{c_enc:>14.2f}{c_dec:>14.2f}")
+    print(f"\n🗜️ Size: %{c_size / j_size * 100:.0f} of JSON | Decode: x{j_dec / c_dec:.2f} speed")
+
+if __name__ == "__main__":
+    run_benchmark(sys.argv[1] if len(sys.argv) > 1 else DB_PATH)
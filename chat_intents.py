@@ -0,0 +1,246 @@
+import re
+from text_utils import search_tokens
+
+# Keyword tables of the chat parser. Matching is plain substring matching on the
+# lowercased query (like the original `w in q` checks), done in one regex pass.
+FOLLOW_UP_KEYWORDS = ("peki", "peki ya", "sadece", "bunlardan", "bunların içinden", "hangileri", "başka")
+
+# "sadece ..." refinement -> league name (last hit wins)
+FOLLOW_UP_LEAGUES = (
+    ("ingiltere", "Premier League"),
+    ("türkiye", "Süper Lig"),
+    ("ispanya", "La Liga"),
+    ("almanya", "Bundesliga"),
+    ("italya", "Serie A"),
+    ("fransa", "Ligue 1"),
+)
+
+# "puan durumu" -> ESPN league code (first hit wins)
+STANDINGS_LEAGUES = (
+    ("ingiltere", "eng.1"), ("türkiye", "tur.1"), ("ispanya", "esp.1"),
+    ("almanya", "ger.1"), ("italya", "ita.1"), ("fransa", "fra.1"),
+    ("süper lig", "tur.1"), ("premier lig", "eng.1"),
+)
+DEFAULT_STANDINGS_LEAGUE = "tur.1"
+
+HIGH_GOALS = ("en gollü", "bol gollü")
+UNDER = ("alt", "under")
+OVER = ("üst", "over", "yüksek", "gol", "bitmeye")
+GOAL_LINES = (("1.5", "1_5"), ("2.5", "2_5"), ("3.5", "3_5"))
+BTTS_YES = ("kg var", "karşılıklı gol")
+BTTS_NO = ("kg yok", "karşılıklı")
+BANKO = ("banko", "güvenilir", "en iyi")
+SURPRISE = ("sürpriz", "süpriz", "oranı yüksek")
+HOME_WIN = ("ev sahibi", "ms 1")
+AWAY_WIN = ("deplasman", "ms 2")
+STANDINGS = ("puan durumu", "sıralama")
+H2H = ("h2h", "aralarındaki", "son maçlar")
+COMBO = ("kombine", "kupon", "kasa")
+STRATEGY = ("strateji", "tavsiye", "advisor")
+SINGLE = ("tek maç",)
+
+ALL_KEYWORDS = sorted(set(
+    FOLLOW_UP_KEYWORDS + HIGH_GOALS + UNDER + OVER + BTTS_YES + BTTS_NO + BANKO + SURPRISE + HOME_WIN
+    + AWAY_WIN + STANDINGS + H2H + COMBO + STRATEGY + SINGLE
+    + tuple(k for k, _ in FOLLOW_UP_LEAGUES) + tuple(k for k, _ in STANDINGS_LEAGUES)
+    + tuple(line for line, _ in GOAL_LINES)
+))
+# One bit per keyword: a query scans to an int mask, a keyword group is a mask too
+KEYWORD_BIT = {k: 1 << i for i, k in enumerate(ALL_KEYWORDS)}
+
+
+def keyword_mask(words):
+    mask = 0
+    for w in words:
+        mask |= KEYWORD_BIT[w]
+    return mask
+
+
+FOLLOW_UP_MASK = keyword_mask(FOLLOW_UP_KEYWORDS)
+HIGH_GOALS_MASK = keyword_mask(HIGH_GOALS)
+UNDER_MASK = keyword_mask(UNDER)
+OVER_MASK = keyword_mask(OVER)
+BTTS_YES_MASK = keyword_mask(BTTS_YES)
+BTTS_NO_MASK = keyword_mask(BTTS_NO)
+BANKO_MASK = keyword_mask(BANKO)
+SURPRISE_MASK = keyword_mask(SURPRISE)
+HOME_WIN_MASK = keyword_mask(HOME_WIN)
+AWAY_WIN_MASK = keyword_mask(AWAY_WIN)
+STANDINGS_MASK = keyword_mask(STANDINGS)
+H2H_MASK = keyword_mask(H2H)
+COMBO_MASK = keyword_mask(COMBO)
+STRATEGY_MASK = keyword_mask(STRATEGY)
+SADECE_BIT = KEYWORD_BIT["sadece"]
+SINGLE_BIT = KEYWORD_BIT["tek maç"]
+FOLLOW_UP_LEAGUE_BITS = tuple((KEYWORD_BIT[k], v) for k, v in FOLLOW_UP_LEAGUES)
+STANDINGS_LEAGUE_BITS = tuple((KEYWORD_BIT[k], v) for k, v in STANDINGS_LEAGUES)
+GOAL_LINE_BITS = tuple((KEYWORD_BIT[line], suffix) for line, suffix in GOAL_LINES)
+
+
+NUMBER_RE = re.compile(r"\d+")
+
+# Words dropped from an h2h question before the team lookup: every parser keyword
+# plus filler and club suffixes that would otherwise match unrelated fixtures
+H2H_FILLER = ("son", "mac", "maci", "macin", "macini", "maclar", "maclari", "maclarini", "ile", "ve",
+              "vs", "karsi", "karsilasma", "karsilasmalari", "gecmis", "sonuclar", "sonuclari",
+              "fc", "sk", "cf", "afc")
+H2H_STOPWORDS = frozenset(t for k in ALL_KEYWORDS for t in search_tokens(k)) | frozenset(H2H_FILLER)
+
+
+def team_query(query):
+    """Folded tokens of a chat question that can name a team (intent words removed)."""
+    return [t for t in search_tokens(query) if t not in H2H_STOPWORDS and not t.isdigit()]
+
+
+class IntentMatcher:
+    """
+    All chat keywords compiled into one prefix-factored regex (longest keyword wins)
+    plus a number group, scanned with a single findall. The result is exact
+    substring semantics, like the original `w in q` chain:
+    - keywords contained in a hit come from a precomputed substring closure;
+    - keywords that could start inside a hit and run past it (overlaps) are
+      listed per keyword at build time and confirmed with `in`;
+    - keywords starting with a digit ("1.5") are confirmed the same way when
+      the query has a number.
+    Hits are returned as a KEYWORD_BIT mask together with the first number.
+    """
+
+    def __init__(self, keywords=ALL_KEYWORDS):
+        self.digit_keywords = tuple((k, KEYWORD_BIT[k]) for k in keywords if k[0].isdigit())
+        words = sorted((k for k in keywords if not k[0].isdigit()), key=len, reverse=True)
+        self.closure = {k: keyword_mask(o for o in keywords if o in k) for k in keywords}
+        self.overlaps = {}
+        for m in words:
+            partners = tuple((k, self.closure[k]) for k in words
+                             if k not in m and any(m.endswith(k[:i]) for i in range(1, min(len(k), len(m)))))
+            if partners:
+                self.overlaps[m] = partners
+        self.digit_words = frozenset(w for w in words if any(ch.isdigit() for ch in w))
+        self.pattern = re.compile("(?P<kw>" + self._trie_regex(words) + r")|(?P<num>\d+)")
+
+    @classmethod
+    def _trie_regex(cls, words):
+        """Alternation factored by common prefixes; the longest keyword wins at a position."""
+        trie = {}
+        for w in words:
+            node = trie
+            for ch in w:
+                node = node.setdefault(ch, {})
+            node[''] = True
+        return cls._node_regex(trie)
+
+    @classmethod
+    def _node_regex(cls, node):
+        branches = [re.escape(ch) + cls._node_regex(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if '' in node:
+            # Keyword ends here: continue greedily to a longer one if possible
+            return "(?:" + body + ")?"
+        return body
+
+    def scan(self, q):
+        """(mask of keywords found in q, first digit run of q or None)."""
+        found = 0
+        number = None
+        digits_in_keyword = False
+        closure, overlaps = self.closure, self.overlaps
+        for kw, num in self.pattern.findall(q):
+            if kw:
+                found |= closure[kw]
+                for k, mask in overlaps.get(kw, ()):
+                    if k in q:
+                        found |= mask
+                if kw in self.digit_words:
+                    digits_in_keyword = True
+            elif number is None:
+                number = num
+        if digits_in_keyword:
+            # A hit like "ms 1" may have consumed the first digit run
+            m = NUMBER_RE.search(q)
+            number = m.group() if m else None
+        if number is not None:
+            for k, bit in self.digit_keywords:
+                if k in q:
+                    found |= bit
+        return found, number
+
+
+intent_matcher = IntentMatcher()
+
+
+def parse_query(query, last_filters=None, matcher=intent_matcher):
+    """
+    Parses a Turkish chat query into a filters dict
+    ({'limit': 3, 'type': 'any', 'sort': 'confidence', 'min_prob': 0, 'league': 'all'} + extras).
+    Same precedence rules as the original keyword chain.
+    """
+    q = query.lower()
+    found, number = matcher.scan(q)
+
+    filters = {
+        'limit': 3,
+        'type': 'any',
+        'sort': 'confidence',
+        'min_prob': 0,
+        'league': 'all'
+    }
+
+    # Follow-up: inherit previous filters, "sadece <ülke>" narrows the league
+    if last_filters and found & FOLLOW_UP_MASK:
+        filters.update(last_filters)
+        if found & SADECE_BIT:
+            for bit, v in FOLLOW_UP_LEAGUE_BITS:
+                if found & bit: filters['league'] = v
+
+    # 1. Limit ("5 tane", "top 10", "tek maç")
+    if number is not None:
+        val = int(number)
+        if 0 < val < 20: filters['limit'] = val
+    if found & SINGLE_BIT: filters['limit'] = 1
+
+    # 2. Intent / type
+    if found & HIGH_GOALS_MASK:
+        filters['type'] = 'high_goals'
+        filters['sort'] = 'goals_desc'
+        return filters
+
+    is_under = found & UNDER_MASK
+    is_over = found & OVER_MASK
+    for bit, suffix in GOAL_LINE_BITS:
+        if found & bit:
+            filters['type'] = f"under_{suffix}" if is_under else f"over_{suffix}"
+            break
+    else:
+        if is_over: filters['type'] = "over_2_5"
+        elif is_under: filters['type'] = "under_2_5"
+        elif found & BTTS_YES_MASK: filters['type'] = "btts_yes"
+        elif found & BTTS_NO_MASK: filters['type'] = "btts_no"
+        elif found & BANKO_MASK:
+            filters['type'] = "banko"
+            filters['min_prob'] = 65
+        elif found & SURPRISE_MASK:
+            filters['type'] = "surprise"
+            filters['sort'] = 'odds_desc'
+            filters['min_prob'] = 0
+        elif found & HOME_WIN_MASK: filters['type'] = "home_win"
+        elif found & AWAY_WIN_MASK: filters['type'] = "away_win"
+
+    # 3. Standings / H2H
+    if found & STANDINGS_MASK:
+        filters['type'] = 'standings'
+        for bit, v in STANDINGS_LEAGUE_BITS:
+            if found & bit: filters['target_league'] = v; break
+        if 'target_league' not in filters: filters['target_league'] = DEFAULT_STANDINGS_LEAGUE
+    elif found & H2H_MASK:
+        filters['type'] = 'h2h'
+
+    # 4. Strategy
+    if found & COMBO_MASK:
+        filters['type'] = 'combo'
+        filters['limit'] = 3
+    elif found & STRATEGY_MASK:
+        filters['type'] = 'strategy'
+
+    return filters
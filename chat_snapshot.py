@@ -0,0 +1,241 @@
+import threading
+from collections import OrderedDict
+from text_utils import search_tokens
+
+# Filter types of MatchChatBot.parse_query that select from the match list
+CHAT_TYPES = ('any', 'banko', 'over_1_5', 'over_2_5', 'over_3_5', 'under_1_5', 'under_2_5', 'under_3_5',
+              'high_goals', 'btts_yes', 'btts_no', 'surprise', 'home_win', 'away_win')
+
+# Odds bands on the higher of the two side prices: (name, lower bound inclusive)
+ODDS_BANDS = (('<1.5', 0.0), ('1.5-2.0', 1.5), ('2.0-3.0', 2.0), ('3.0+', 3.0))
+SURPRISE_BANDS = ('2.0-3.0', '3.0+')
+
+# Rendered chat replies kept per snapshot version
+ANSWER_CACHE_SIZE = 256
+
+# Pick labels indexed from recommendation / best_goal_pick
+PICK_LABELS = ('KASA', 'BANKO', 'MS 1', 'MS 2', '1.5 ÜST', '2.5 ÜST', '3.5 ÜST', 'ALT', 'KG VAR', 'KG YOK')
+
+
+def _price(value, strict=False):
+    """float price; missing values count as 0 unless strict (then None, like a parse error)."""
+    try:
+        return float(value if strict else value or 0)
+    except (TypeError, ValueError):
+        return None
+
+
+def _number(value):
+    return value if isinstance(value, (int, float)) else 0
+
+
+def odds_band(max_odds):
+    if max_odds is None:
+        return None
+    name = None
+    for band, low in ODDS_BANDS:
+        if max_odds >= low:
+            name = band
+    return name
+
+
+class ChatSnapshot:
+    """
+    Immutable chatbot view of one MatchSnapshot version: per-match sort keys and
+    indexes by pick, filter type, league and odds band. Ranked lists are built on
+    first use and memoized; nothing here is mutated after that.
+    """
+
+    def __init__(self, snapshot):
+        self.version = snapshot.version
+        self.generation = snapshot.generation
+        self.matches = tuple(snapshot.matches)
+        self.by_id = snapshot.by_id
+
+        self.score = {}       # id -> confidence score (KASA/BANKO bonus + best_goal_prob)
+        self.goals = {}       # id -> total_goals_prediction
+        self.max_odds = {}    # id -> max(home, away) price, 0 when unparsable
+        self.by_pick = {label: [] for label in PICK_LABELS}
+        self.by_odds_band = {band: [] for band, _ in ODDS_BANDS}
+        self.by_league = {}
+        sides = {}
+
+        for m in self.matches:
+            m_id = m.get('id')
+            ps = m.get('pro_stats') or {}
+            rec = m.get('recommendation') or ''
+            goal_pick = ps.get('best_goal_pick') or ''
+
+            score = 100 if "KASA" in rec else 80 if "BANKO" in rec else 0
+            self.score[m_id] = score + _number(ps.get('best_goal_prob', 50))
+            self.goals[m_id] = _number(ps.get('total_goals_prediction', 0))
+
+            odds = m.get('odds') or {}
+            home, away = _price(odds.get('home')), _price(odds.get('away'))
+            sides[m_id] = (home, away)
+            self.max_odds[m_id] = max(home or 0, away or 0)
+            strict = _price(odds.get('home'), True), _price(odds.get('away'), True)
+            band = odds_band(max(strict) if None not in strict else None)
+            if band:
+                self.by_odds_band[band].append(m_id)
+
+            for label in PICK_LABELS:
+                if label in rec or label in goal_pick:
+                    self.by_pick[label].append(m_id)
+            self.by_league.setdefault(m.get('league'), []).append(m_id)
+
+        self._league_tokens = {league: set(search_tokens(league or '')) for league in self.by_league}
+
+        surprise = set()
+        for band in SURPRISE_BANDS:
+            surprise.update(self.by_odds_band[band])
+        self.by_type = {t: [m.get('id') for m in self.matches if self._matches_type(t, m, surprise)]
+                        for t in CHAT_TYPES}
+
+        self._ranked = {}
+        self._league_ids = {}
+        self._lock = threading.Lock()
+
+        # Strategy / combo candidates, in feed order like the original scans
+        goal_prob = {m.get('id'): _number((m.get('pro_stats') or {}).get('best_goal_prob', 0)) for m in self.matches}
+        self.combo = sorted(
+            ({'match': m, 'score': goal_prob[m.get('id')]} for m in self.matches
+             if goal_prob[m.get('id')] > 78 or "KASA" in (m.get('recommendation') or '')),
+            key=lambda x: x['score'], reverse=True)
+        self.bankos = [m for m in self.matches if "KASA" in (m.get('recommendation') or '')]
+        self.overs = [m for m in self.matches if goal_prob[m.get('id')] > 75]
+        self.surprises = [m for m in self.matches
+                          if (sides[m.get('id')][0] or 0) > 2.5 or (sides[m.get('id')][1] or 0) > 2.5]
+
+    @staticmethod
+    def _matches_type(ftype, m, surprise):
+        ps = m.get('pro_stats') or {}
+        rec = m.get('recommendation') or ''
+        pick = ps.get('best_goal_pick') or ''
+        if ftype == 'banko':
+            return "KASA" in rec or "BANKO" in rec or _number(ps.get('best_goal_prob', 0)) > 70
+        if ftype == 'over_1_5':
+            return "1.5 ÜST" in pick or "2.5 ÜST" in pick or "3.5 ÜST" in pick
+        if ftype == 'over_2_5':
+            return "2.5 ÜST" in pick or "3.5 ÜST" in pick
+        if ftype == 'over_3_5':
+            return "3.5 ÜST" in pick
+        if ftype.startswith('under_'):
+            return "ALT" in pick
+        if ftype == 'high_goals':
+            return _number(ps.get('total_goals_prediction', 0)) >= 2.0
+        if ftype == 'btts_yes':
+            return "KG VAR" in pick
+        if ftype == 'btts_no':
+            return "KG YOK" in pick
+        if ftype == 'surprise':
+            return m.get('id') in surprise
+        if ftype == 'home_win':
+            return "MS 1" in rec
+        if ftype == 'away_win':
+            return "MS 2" in rec
+        return True
+
+    def ranked(self, ftype, sort):
+        """Matches of a filter type in reply order (stable, feed order on ties)."""
+        key = (ftype, sort)
+        ranked = self._ranked.get(key)
+        if ranked is None:
+            ids = self.by_type.get(ftype)
+            if ids is None:
+                ids = [m.get('id') for m in self.matches]
+            if sort == 'goals_desc':
+                sort_key = self.goals
+            elif sort == 'odds_desc':
+                sort_key = self.max_odds
+            else:
+                sort_key = self.score
+            ranked = tuple(sorted(ids, key=lambda i: sort_key[i], reverse=True))
+            with self._lock:
+                ranked = self._ranked.setdefault(key, ranked)
+        return ranked
+
+    def league_ids(self, league):
+        """Ids of matches whose league name contains every (folded) token of `league`."""
+        ids = self._league_ids.get(league)
+        if ids is None:
+            wanted = set(search_tokens(league))
+            ids = frozenset(m_id for name, tokens in self._league_tokens.items() if wanted and wanted <= tokens
+                            for m_id in self.by_league[name])
+            with self._lock:
+                ids = self._league_ids.setdefault(league, ids)
+        return ids
+
+    def select(self, ftype, sort='confidence', league='all', limit=3):
+        """[{'match', 'score'}, ...] for a parsed chat filter."""
+        league_ids = self.league_ids(league) if league and league != 'all' else None
+        results = []
+        for m_id in self.ranked(ftype, sort):
+            if league_ids is not None and m_id not in league_ids:
+                continue
+            score = self.goals[m_id] if sort == 'goals_desc' else self.score[m_id]
+            results.append({'match': self.by_id[m_id], 'score': score})
+            if len(results) >= limit:
+                break
+        return results
+
+
+class ChatSnapshotCache:
+    """ChatSnapshot of the current MatchSnapshot, rebuilt only when its version changes."""
+
+    def __init__(self, snapshot_cache):
+        self.snapshot_cache = snapshot_cache
+        self._current = None
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def get(self):
+        snap = self.snapshot_cache.get()
+        current = self._current
+        if current is not None and current.version == snap.version:
+            return current
+        with self._lock:
+            if self._current is None or self._current.version != snap.version:
+                self._current = ChatSnapshot(snap)
+                self.rebuilds += 1
+            return self._current
+
+
+class AnswerCache:
+    """
+    LRU of rendered chat replies keyed by (snapshot version, frozen filters).
+    A new version clears it, so replies never outlive the data they were built from.
+    """
+
+    def __init__(self, max_entries=ANSWER_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, version, key, build):
+        with self._lock:
+            if version != self._version:
+                if self._entries:
+                    self.stats['invalidations'] += 1
+                self._entries.clear()
+                self._version = version
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                self.stats['hits'] += 1
+                return html
+            self.stats['misses'] += 1
+        html = build()
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = html
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.stats['evictions'] += 1
+        return html
+
+    def info(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return dict(self.stats, size=len(self._entries), hit_rate=round(self.stats['hits'] / lookups, 3) if lookups else 0.0)
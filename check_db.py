@@ -1,5 +1,5 @@
 import sqlite3
-import json
+from db_manager import decode_prediction
 from datetime import datetime
 
 with sqlite3.connect("kahin_data.db") as conn:
@@ -8,5 +8,5 @@ with sqlite3.connect("kahin_data.db") as conn:
     cursor.execute("SELECT prediction_json FROM matches LIMIT 30")
     rows = cursor.fetchall()
     for row in rows:
-        m = json.loads(row['prediction_json'])
+        m = decode_prediction(row['prediction_json'])
         print(f"ID: {m.get('id')} | Time: {m.get('time')} | Status: {m.get('status')} | Score: {m.get('score')}")
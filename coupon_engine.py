@@ -0,0 +1,71 @@
+import heapq
+
+# (key, label, sim_details probability field); MS takes the stronger side
+COUPON_MARKETS = (
+    ('1.5_UST', '1.5 ÜST', 'over_1_5_prob'),
+    ('2.5_UST', '2.5 ÜST', 'over_2_5_prob'),
+    ('KG_VAR', 'KG VAR', 'btts_prob'),
+    ('MS', None, None),
+)
+COUPON_COUNT = 3
+COUPON_MIN_PROB = 65
+
+# A match is used at most once across all coupons, so the best unused candidate
+# of a market is always within its top COUPON_COUNT * len(COUPON_MARKETS) entries
+TOP_K = COUPON_COUNT * len(COUPON_MARKETS)
+
+
+def market_pick(m, market_key):
+    """(probability, label) of a match for a coupon market."""
+    sim = (m.get('pro_stats') or {}).get('sim_details') or {}
+    if market_key == 'MS':
+        h_p = sim.get('home_win_prob', 0) or 0
+        a_p = sim.get('away_win_prob', 0) or 0
+        return max(h_p, a_p), ('MS 1' if h_p > a_p else 'MS 2')
+    for key, label, field in COUPON_MARKETS:
+        if key == market_key:
+            return sim.get(field, 0) or 0, label
+    return 0, None
+
+
+def market_candidates(matches, k=TOP_K, min_prob=COUPON_MIN_PROB):
+    """
+    Per-market top-k of open soccer matches, best probability first.
+    Ties keep feed order. Entries are (prob, label, match).
+    """
+    soccer = [m for m in matches if m.get('sport') == 'soccer' and m.get('status') != 'Completed']
+    candidates = {}
+    for market_key, _, _ in COUPON_MARKETS:
+        scored = []
+        for idx, m in enumerate(soccer):
+            prob, label = market_pick(m, market_key)
+            if prob > min_prob:
+                scored.append((prob, -idx, label, m))
+        top = heapq.nlargest(k, scored, key=lambda x: (x[0], x[1]))
+        candidates[market_key] = tuple((prob, label, m) for prob, _, label, m in top)
+    return candidates
+
+
+def build_coupons(candidates, count=COUPON_COUNT):
+    """
+    Coupons from precomputed candidates: each coupon takes the best unused match
+    of every market in turn. Returns new dicts; the shared matches are not touched.
+    """
+    used_ids = set()
+    coupons = []
+    for i in range(count):
+        coupon = []
+        for market_key, _, _ in COUPON_MARKETS:
+            for prob, label, m in candidates.get(market_key, ()):
+                if m['id'] not in used_ids:
+                    used_ids.add(m['id'])
+                    coupon.append({**m, 'coupon_pick': label, 'coupon_prob': int(prob)})
+                    break
+        if coupon:
+            coupons.append({
+                "id": i + 1,
+                "name": f"KAHİN KUPONU #{i+1}",
+                "matches": coupon,
+                "total_odds": round(sum([float(x.get('odds', {}).get('home', 1.5)) for x in coupon]) / len(coupon) * 2.5, 2) # Mock odds calc
+            })
+    return coupons
@@ -1,7 +1,7 @@
 import json
 import os
 from datetime import datetime
-from scraper_engine import scrape_todays_fixtures, sofa_adapter
+from scraper_engine import scrape_todays_fixtures, get_sofa_adapter
 from telegram_bot import send_kahin_alert, format_match_alert
 
 def run_elite_update():
@@ -17,7 +17,7 @@ def run_elite_update():
         db_manager.cleanup_stale_matches()
 
         print("🧹 Clearing SofaScore cache for fresh data...")
-        sofa_adapter.reset_cache()
+        get_sofa_adapter().reset_cache()
 
         # 1. Scrape all fixtures (This does the heavy lifting: ESPN + SofaScore blending)
         print("🔍 Scraping fixtures and deep stats...")
@@ -80,6 +80,23 @@ def run_elite_update():
             json.dump(combined_history, f, indent=4, ensure_ascii=False)
             
         print(f"✅ HISTORY SUCCESS: {len(combined_history)} total matches saved to {history_file} (Merged)")
+
+        # 4. Retention: archive old finished matches, ANALYZE + VACUUM (once a day)
+        db_manager.run_maintenance_if_due()
+
+        # 5. Multi-worker mode: publish the snapshot file the web workers mmap
+        from match_snapshot import snapshot_cache
+        from snapshot_file import SHARED_SNAPSHOT, write_snapshot_file
+        snap = snapshot_cache.get()
+        if SHARED_SNAPSHOT:
+            name = write_snapshot_file(snap, deltas=snapshot_cache.delta_log())
+            if name:
+                print(f"🗂️ Paylaşılan snapshot yazıldı: {name}")
+
+        # 6. Static shards per sport/league/day for CDN hosting
+        from static_export import export_static, EXPORT_DIR
+        written, unchanged, removed = export_static(snap.active, snap.history, snap.generation)
+        print(f"📦 Statik export: {written} yeni/değişen, {unchanged} aynı, {removed} silinen parça ({EXPORT_DIR}/)")
         
     except Exception as e:
         print(f"❌ CRITICAL ERROR: {e}")
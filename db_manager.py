@@ -1,17 +1,300 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from text_utils import fold_search_text, search_tokens
 
 DB_PATH = "kahin_data.db"
 
+# Applied once per connection, right after it is opened.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA mmap_size=67108864",   # 64 MB
+    "PRAGMA cache_size=-16000",    # ~16 MB page cache
+    "PRAGMA busy_timeout=5000",
+)
+
+# Size of sqlite3's per-connection prepared statement cache.
+STATEMENT_CACHE_SIZE = 256
+
+
+# --- prediction_json STORAGE FORMATS ---
+# 0: legacy JSON text. 2: zlib-compressed compact JSON behind a 2-byte tag.
+FORMAT_JSON = 0
+FORMAT_COMPACT = 2
+COMPACT_MAGIC = b"\xc0"
+
+# Opt in with KAHIN_COMPACT_DB=1 (or DatabaseManager(compact=True))
+COMPACT_DEFAULT = os.environ.get("KAHIN_COMPACT_DB", "0") == "1"
+
+
+def encode_prediction(match_data, compact=False):
+    """Serializes a match dict for the prediction_json column."""
+    if compact:
+        text = json.dumps(match_data, ensure_ascii=False, separators=(',', ':'))
+        return COMPACT_MAGIC + bytes([FORMAT_COMPACT]) + zlib.compress(text.encode('utf-8'), 6)
+    return json.dumps(match_data, ensure_ascii=False)
+
+
+def decode_prediction(value):
+    """Decodes a prediction_json value written in any known format."""
+    if isinstance(value, bytes):
+        if value[:1] == COMPACT_MAGIC:
+            version = value[1]
+            if version == FORMAT_COMPACT:
+                return json.loads(zlib.decompress(value[2:]))
+            raise ValueError(f"Unknown prediction format version: {version}")
+        value = value.decode("utf-8")
+    return json.loads(value)
+
+
+# --- RETENTION ---
+FINISHED_STATUSES = ('Completed', 'Finished')
+RETENTION_DAYS = 7            # Finished matches older than this move to matches_archive
+MAINTENANCE_INTERVAL_HOURS = 24
+
+# Heavy fields dropped when a match is archived
+ARCHIVE_DROP_KEYS = ('reasoning', 'live_details')
+ARCHIVE_DROP_PRO_KEYS = ('sofa_elite', 'momentum')
+
+
+# --- SUCCESS-RATE AGGREGATES (pick_stats) ---
+# market -> (result field, confidence source)
+PICK_MARKETS = {
+    'MS': 'result',
+    'GOAL': 'goal_pick_result',
+    'PROPS': 'props_pick_result',
+}
+PICK_STATS_GROUPS = ('day', 'league', 'sport', 'market', 'conf_bucket')
+
+
+def pick_confidence(match_data, market):
+    """Model probability (0-100) behind the graded pick of a market."""
+    pro = match_data.get('pro_stats') or {}
+    if market == 'GOAL':
+        return pro.get('best_goal_prob', 0) or 0
+    if market == 'PROPS':
+        return pro.get('best_props_prob', 0) or 0
+    sim = pro.get('sim_details') or {}
+    return max(sim.get('home_win_prob', 0) or 0, sim.get('away_win_prob', 0) or 0)
+
+
+def pick_stat_rows(match_data):
+    """(day, league, sport, market, conf_bucket, won) for every graded pick of a finished match."""
+    kickoff = match_data.get('kickoff') or ''
+    day = kickoff[:10] if len(kickoff) >= 10 else datetime.now().strftime("%Y-%m-%d")
+    rows = []
+    for market, field in PICK_MARKETS.items():
+        res = match_data.get(field)
+        if res not in ('won', 'lost'): continue
+        try:
+            bucket = max(0, min(90, int(float(pick_confidence(match_data, market)) // 10 * 10)))
+        except (TypeError, ValueError):
+            bucket = 0
+        rows.append((day, match_data.get('league') or '', match_data.get('sport', 'soccer'),
+                     market, bucket, 1 if res == 'won' else 0))
+    return rows
+
+
+# --- ODDS TICKS ---
+ODDS_TICK_FULL_HOURS = 24      # Ticks newer than this are kept at full resolution
+ODDS_TICK_BUCKET_SECONDS = 3600  # Older ticks are downsampled to the last one per bucket
+ODDS_TICK_RETENTION_DAYS = RETENTION_DAYS
+
+
+# --- SEARCH INDEX (FTS5) ---
+# bm25 weights per match_search column: id, sport, home, away, league, aliases, picks
+SEARCH_WEIGHTS = (0, 0, 10.0, 10.0, 3.0, 5.0, 1.0)
+SEARCH_COLUMNS = ('home', 'away', 'league', 'aliases', 'picks')
+
+
+def search_document(match_data):
+    """Folded (Turkish-diacritic free) text columns indexed for a match."""
+    pro = match_data.get('pro_stats') or {}
+    sofa = pro.get('sofa_elite') or {}
+    aliases = set()
+    for key in ('homeTeam', 'awayTeam', 'name'):
+        val = sofa.get(key) if isinstance(sofa, dict) else None
+        if isinstance(val, dict): val = val.get('name')
+        if val: aliases.add(fold_search_text(str(val)))
+    picks = " ".join(str(p) for p in (match_data.get('recommendation'), pro.get('best_goal_pick'),
+                                      pro.get('best_props_pick')) if p)
+    return (
+        fold_search_text(match_data.get('home')),
+        fold_search_text(match_data.get('away')),
+        fold_search_text(match_data.get('league')),
+        " ".join(sorted(aliases)),
+        fold_search_text(picks),
+    )
+
+
+def is_active_match(m, now=None):
+    """True for matches from today onwards and live ones (used by get_active_matches)."""
+    now = now or datetime.now()
+    try:
+        # Expected format: "12.02 23:00" or "HT" or "15'"
+        time_str = m.get('time', '')
+        if '.' in time_str and ' ' in time_str:
+            m_date_str = time_str.split(' ')[0] # "12.02"
+            m_date = datetime.strptime(f"{m_date_str}.{now.year}", "%d.%m.%Y")
+            # If match date is today or future
+            return m_date.date() >= now.date()
+        elif any(live in time_str for live in ['HT', "'", 'Live']):
+            # Keep live matches for now, but we will clean them if they are too old elsewhere
+            return True
+    except:
+        # If date parsing fails, keep it just in case if it's upcoming
+        return m.get('status') == 'Upcoming'
+    return False
+
+
+def is_history_match(m):
+    return m.get('status') in FINISHED_STATUSES or m.get('result') != 'pending'
+
+
+def slim_match(match_data):
+    """Copy of a match without the heavy analysis payloads (for the archive)."""
+    slim = {k: v for k, v in match_data.items() if k not in ARCHIVE_DROP_KEYS}
+    pro = match_data.get('pro_stats')
+    if isinstance(pro, dict):
+        slim['pro_stats'] = {k: v for k, v in pro.items() if k not in ARCHIVE_DROP_PRO_KEYS}
+    return slim
+
+
+# Idle connections kept for reuse once their owning thread has exited.
+MAX_IDLE_CONNECTIONS = 8
+
+
+class _ThreadConnections:
+    """Holds one thread's connections; hands them back to the pool when the thread ends."""
+
+    def __init__(self, manager):
+        self.manager = manager
+        self.writer = None
+        self.reader = None
+
+    def __del__(self):
+        try:
+            self.manager._release(self.writer, read_only=False)
+            if self.reader is not self.writer:
+                self.manager._release(self.reader, read_only=True)
+        except Exception:
+            pass
+
+
+class ConnectionManager:
+    """
+    Keeps one long-lived read-write and one read-only SQLite connection per thread.
+    Flask request threads, the chatbot and the data loop all share a single
+    DatabaseManager, so connections are reused instead of opened per call.
+    When a thread exits (the dev server spawns one per request) its connections go
+    back to a small idle pool, so pragmas and the statement cache survive.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._idle = {False: [], True: []}
+        self._all = set()
+
+    def _open(self, read_only=False):
+        if read_only:
+            uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        else:
+            conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                                   cached_statements=STATEMENT_CACHE_SIZE)
+        for pragma in CONNECTION_PRAGMAS:
+            # journal_mode is persistent and can only be switched by a writer
+            if read_only and "journal_mode" in pragma: continue
+            conn.execute(pragma)
+        if read_only:
+            conn.execute("PRAGMA query_only=ON")
+        with self._lock:
+            self._all.add(conn)
+        return conn
+
+    def _acquire(self, read_only):
+        with self._lock:
+            if self._idle[read_only]:
+                return self._idle[read_only].pop()
+        return self._open(read_only)
+
+    def _release(self, conn, read_only):
+        if conn is None: return
+        if conn.in_transaction:
+            conn.rollback()
+        with self._lock:
+            if len(self._idle[read_only]) < MAX_IDLE_CONNECTIONS:
+                self._idle[read_only].append(conn)
+                return
+            self._all.discard(conn)
+        conn.close()
+
+    def _slots(self):
+        slots = getattr(self._local, 'slots', None)
+        if slots is None:
+            slots = _ThreadConnections(self)
+            self._local.slots = slots
+        return slots
+
+    def writer(self):
+        """Per-thread read-write connection."""
+        slots = self._slots()
+        if slots.writer is None:
+            slots.writer = self._acquire(read_only=False)
+        return slots.writer
+
+    def reader(self):
+        """Per-thread read-only connection for query paths."""
+        slots = self._slots()
+        if slots.reader is None:
+            if self.db_path == ":memory:":
+                # An in-memory DB only exists on its writer connection
+                slots.reader = self.writer()
+            else:
+                try:
+                    slots.reader = self._acquire(read_only=True)
+                except sqlite3.OperationalError:
+                    slots.reader = self.writer()
+        return slots.reader
+
+    def close_all(self):
+        """Closes every connection opened by any thread (e.g. on shutdown)."""
+        with self._lock:
+            conns, self._all = self._all, set()
+            self._idle = {False: [], True: []}
+        for conn in conns:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
+
+
 class DatabaseManager:
-    def __init__(self, db_path=DB_PATH):
+    def __init__(self, db_path=DB_PATH, compact=None):
         self.db_path = db_path
+        self.compact = COMPACT_DEFAULT if compact is None else compact
+        self.connections = ConnectionManager(db_path)
         self._init_db()
+        if self.compact and self.get_meta('prediction_format') != str(FORMAT_COMPACT):
+            self.migrate_prediction_format()
 
     def _get_connection(self):
-        return sqlite3.connect(self.db_path)
+        return self.connections.writer()
+
+    def _get_read_connection(self):
+        return self.connections.reader()
+
+    def close(self):
+        self.connections.close_all()
 
     def _init_db(self):
         with self._get_connection() as conn:
@@ -32,6 +315,83 @@ class DatabaseManager:
                 )
             """)
             
+            added = self._ensure_columns(cursor, "matches", {
+                "kickoff": "TEXT",       # ISO kickoff e.g. 2026-02-12T19:00Z
+                "result": "TEXT",
+                "goal_pick_result": "TEXT",
+                "props_pick_result": "TEXT",
+            })
+            
+            # 1b. Archive of old finished matches (slim schema, see slim_match)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS matches_archive (
+                    id TEXT PRIMARY KEY,
+                    league TEXT,
+                    home TEXT,
+                    away TEXT,
+                    sport TEXT,
+                    status TEXT,
+                    score TEXT,
+                    kickoff TEXT,
+                    result TEXT,
+                    goal_pick_result TEXT,
+                    props_pick_result TEXT,
+                    summary_json TEXT,
+                    archived_at DATETIME
+                )
+            """)
+            
+            self._ensure_columns(cursor, "matches_archive", {"props_pick_result": "TEXT"})
+            
+            # Keyset pagination of history (kickoff is '' when unknown, never NULL)
+            for table in ("matches", "matches_archive"):
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_kickoff ON {table} (kickoff, id)")
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_sport_kickoff ON {table} (sport, kickoff, id)")
+            
+            # 1c. Success-rate aggregates, maintained when a match turns finished
+            created_stats = not cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='pick_stats'").fetchone()
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS pick_stats (
+                    day TEXT,
+                    league TEXT,
+                    sport TEXT,
+                    market TEXT,
+                    conf_bucket INTEGER,
+                    total INTEGER DEFAULT 0,
+                    wins INTEGER DEFAULT 0,
+                    PRIMARY KEY (day, league, sport, market, conf_bucket)
+                ) WITHOUT ROWID
+            """)
+            
+            # 1d. Full-text search over teams, aliases, leagues and picks (rowid = matches.rowid)
+            self.fts_enabled = True
+            try:
+                created_fts = not cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE name='match_search'").fetchone()
+                cursor.execute("""
+                    CREATE VIRTUAL TABLE IF NOT EXISTS match_search USING fts5(
+                        id UNINDEXED, sport UNINDEXED, home, away, league, aliases, picks,
+                        tokenize = 'unicode61 remove_diacritics 2'
+                    )
+                """)
+            except sqlite3.OperationalError:
+                # SQLite built without FTS5: search_matches falls back to a scan
+                self.fts_enabled = created_fts = False
+            
+            # 1e. Append-only odds price ticks (only written when a price changes)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS odds_ticks (
+                    match_id TEXT,
+                    source TEXT,
+                    market TEXT,
+                    side TEXT,
+                    ts INTEGER,
+                    price REAL,
+                    PRIMARY KEY (match_id, source, market, side, ts)
+                ) WITHOUT ROWID
+            """)
+            
             # 2. History Table
             cursor.execute("""
                 CREATE TABLE IF NOT EXISTS history (
@@ -52,114 +412,506 @@ class DatabaseManager:
                 )
             """)
             
+            # 4. Key/Value Metadata (storage format, maintenance stamps...)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                )
+            """)
+            
+            if added:
+                self._backfill_columns(cursor)
+            if created_stats:
+                self._rebuild_pick_stats(cursor)
+            if created_fts:
+                self._rebuild_search_index(cursor)
+            # One-time: rows stored before kickoff was kept NOT NULL ('' when unknown)
+            if not cursor.execute("SELECT 1 FROM meta WHERE key='kickoff_backfilled'").fetchone():
+                for table in ("matches", "matches_archive"):
+                    cursor.execute(f"UPDATE {table} SET kickoff='' WHERE kickoff IS NULL")
+                self._set_meta(cursor, 'kickoff_backfilled', 1)
+            
             conn.commit()
 
+    def _ensure_columns(self, cursor, table, columns):
+        """Adds missing columns to an existing table. Returns the names added."""
+        existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+        added = []
+        for name, col_type in columns.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {col_type}")
+                added.append(name)
+        return added
+
+    def _backfill_columns(self, cursor):
+        """Fills the denormalized columns from prediction_json for rows stored before they existed."""
+        rows = cursor.execute("SELECT id, prediction_json FROM matches").fetchall()
+        for match_id, value in rows:
+            data = decode_prediction(value)
+            cursor.execute(
+                "UPDATE matches SET kickoff=?, result=?, goal_pick_result=?, props_pick_result=? WHERE id=?",
+                (data.get('kickoff') or '', data.get('result'), data.get('goal_pick_result'),
+                 data.get('props_pick_result'), match_id))
+
+    def get_meta(self, key, default=None):
+        row = self._get_read_connection().execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key, value):
+        with self._get_connection() as conn:
+            self._set_meta(conn.cursor(), key, value)
+
+    def _set_meta(self, cursor, key, value):
+        cursor.execute("""
+            INSERT INTO meta (key, value) VALUES (?, ?)
+            ON CONFLICT(key) DO UPDATE SET value=excluded.value
+        """, (key, str(value)))
+
+    def _bump_generation(self, cursor):
+        """Marks a committed data change; readers compare get_generation() to detect fresh data."""
+        cursor.execute("""
+            INSERT INTO meta (key, value) VALUES ('generation', '1')
+            ON CONFLICT(key) DO UPDATE SET value=CAST(value AS INTEGER) + 1
+        """)
+
+    def get_generation(self):
+        """Monotonic counter bumped by every write to the matches data."""
+        return int(self.get_meta('generation', 0))
+
+    def migrate_prediction_format(self, compact=None):
+        """
+        One-shot re-encode of every stored prediction_json into the current format.
+        Returns the number of rows rewritten.
+        """
+        compact = self.compact if compact is None else compact
+        target = FORMAT_COMPACT if compact else FORMAT_JSON
+        rewritten = 0
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            for table, column in (("matches", "prediction_json"), ("matches_archive", "summary_json")):
+                rows = cursor.execute(f"SELECT id, {column} FROM {table}").fetchall()
+                for match_id, value in rows:
+                    is_compact = isinstance(value, bytes) and value[:2] == COMPACT_MAGIC + bytes([FORMAT_COMPACT])
+                    if is_compact == compact: continue
+                    cursor.execute(f"UPDATE {table} SET {column}=? WHERE id=?",
+                                   (encode_prediction(decode_prediction(value), compact), match_id))
+                    rewritten += 1
+            self._set_meta(cursor, 'prediction_format', target)
+            if rewritten:
+                self._bump_generation(cursor)
+        print(f"🗜️ prediction_json migration: {rewritten} rows -> format {target}")
+        return rewritten
+
     def upsert_match(self, match_data):
         """
         Inserts or updates a match in the database.
         match_data is a dict containing all match info.
         """
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            self._upsert_match(cursor, match_data)
+            self._bump_generation(cursor)
+
+    def _upsert_match(self, cursor, match_data):
         match_id = match_data.get('id')
         if not match_id: return
+        # Already archived (and counted): a re-scraped copy would be counted and listed twice
+        if cursor.execute("SELECT 1 FROM matches_archive WHERE id=?", (match_id,)).fetchone(): return
         
-        # Serialize the full dict as JSON for flexibility, but keep core fields for querying
-        prediction_json = json.dumps(match_data, ensure_ascii=False)
+        # Serialize the full dict (JSON or compact blob), but keep core fields for querying
+        prediction_json = encode_prediction(match_data, self.compact)
         
-        with self._get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO matches (id, league, home, away, sport, status, score, prediction_json, last_update)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(id) DO UPDATE SET
-                    status=excluded.status,
-                    score=excluded.score,
-                    prediction_json=excluded.prediction_json,
-                    last_update=excluded.last_update
-            """, (
-                match_id,
-                match_data.get('league'),
-                match_data.get('home'),
-                match_data.get('away'),
-                match_data.get('sport', 'soccer'),
-                match_data.get('status'),
-                match_data.get('score'),
-                prediction_json,
-                datetime.now()
-            ))
-            conn.commit()
+        # Count graded picks exactly once: on the transition into a finished status
+        if match_data.get('status') in FINISHED_STATUSES:
+            prev = cursor.execute("SELECT status FROM matches WHERE id=?", (match_id,)).fetchone()
+            if not prev or prev[0] not in FINISHED_STATUSES:
+                self._add_pick_stats(cursor, match_data)
+        
+        cursor.execute("""
+            INSERT INTO matches (id, league, home, away, sport, status, score, prediction_json, last_update,
+                                 kickoff, result, goal_pick_result, props_pick_result)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET
+                status=excluded.status,
+                score=excluded.score,
+                prediction_json=excluded.prediction_json,
+                last_update=excluded.last_update,
+                kickoff=CASE WHEN excluded.kickoff != '' THEN excluded.kickoff ELSE matches.kickoff END,
+                result=excluded.result,
+                goal_pick_result=excluded.goal_pick_result,
+                props_pick_result=excluded.props_pick_result
+        """, (
+            match_id,
+            match_data.get('league'),
+            match_data.get('home'),
+            match_data.get('away'),
+            match_data.get('sport', 'soccer'),
+            match_data.get('status'),
+            match_data.get('score'),
+            prediction_json,
+            datetime.now(),
+            match_data.get('kickoff') or '',
+            match_data.get('result'),
+            match_data.get('goal_pick_result'),
+            match_data.get('props_pick_result')
+        ))
+        if self.fts_enabled:
+            self._index_match(cursor, match_data)
 
     def save_matches_batch(self, matches_list):
-        for m in matches_list:
-            self.upsert_match(m)
-
-    def get_all_matches(self):
+        # One transaction for the whole batch instead of a commit per match
         with self._get_connection() as conn:
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            cursor.execute("SELECT prediction_json FROM matches")
-            rows = cursor.fetchall()
-            return [json.loads(row['prediction_json']) for row in rows]
+            for m in matches_list:
+                self._upsert_match(cursor, m)
+            self._bump_generation(cursor)
+
+    def get_all_matches(self):
+        conn = self._get_read_connection()
+        rows = conn.execute("SELECT prediction_json FROM matches").fetchall()
+        return [decode_prediction(row[0]) for row in rows]
 
     def get_active_matches(self, days_limit=1):
         """Returns only matches from today and onwards."""
-        all_matches = self.get_all_matches()
         now = datetime.now()
-        active = []
-        for m in all_matches:
-            try:
-                # Expected format: "12.02 23:00" or "HT" or "15'"
-                time_str = m.get('time', '')
-                if '.' in time_str and ' ' in time_str:
-                    m_date_str = time_str.split(' ')[0] # "12.02"
-                    m_date = datetime.strptime(f"{m_date_str}.{now.year}", "%d.%m.%Y")
-                    # If match date is today or future
-                    if m_date.date() >= now.date():
-                        active.append(m)
-                elif any(live in time_str for live in ['HT', "'", 'Live']):
-                    # Keep live matches for now, but we will clean them if they are too old elsewhere
-                    active.append(m)
-            except:
-                # If date parsing fails, keep it just in case if it's upcoming
-                if m.get('status') == 'Upcoming':
-                    active.append(m)
-        return active
+        return [m for m in self.get_all_matches() if is_active_match(m, now)]
+
+    def get_archived_matches(self):
+        """Slim archived matches, newest kickoff first."""
+        rows = self._get_read_connection().execute(
+            "SELECT summary_json FROM matches_archive ORDER BY kickoff DESC").fetchall()
+        return [decode_prediction(row[0]) for row in rows]
+
+    def get_history_matches(self, sport=None):
+        """
+        Finished (or already graded) matches from the hot table plus the archive.
+        Archived entries are slim copies without reasoning/sofa_elite.
+        """
+        history = [m for m in self.get_all_matches() if is_history_match(m)]
+        history.extend(self.get_archived_matches())
+        if sport:
+            history = [m for m in history if m.get('sport') == sport]
+        return history
+
+    def get_history_page(self, limit=50, cursor=None, sport=None, league=None, date_from=None, date_to=None,
+                         result=None, market=None, full=False):
+        """
+        One page of history (hot + archive), newest kickoff first, via keyset pagination.
+        cursor is the 'kickoff|id' returned as next_cursor by the previous page.
+        market (MS/GOAL/PROPS) keeps only graded picks of that market; result filters
+        on that market's outcome (MS when no market is given).
+        Returns (matches, next_cursor). Heavy fields are dropped unless full=True.
+        Raises ValueError for a market outside PICK_MARKETS.
+        """
+        if market and market not in PICK_MARKETS:
+            raise ValueError(f"Unknown market: {market}")
+        limit = max(1, min(int(limit), 500))
+        where = ["(status IN ('Finished', 'Completed') OR result IS NOT 'pending')"]
+        params = []
+        if sport: where.append("sport = ?"); params.append(sport)
+        if league:
+            leagues = [l.strip() for l in league.split(',') if l.strip()]
+            where.append(f"league IN ({', '.join('?' * len(leagues))})"); params.extend(leagues)
+        if date_from: where.append("kickoff >= ?"); params.append(date_from)
+        if date_to: where.append("kickoff < ?"); params.append(date_to + "~")  # whole last day
+        field = PICK_MARKETS[market or 'MS']
+        if market: where.append(f"{field} IN ('won', 'lost')")
+        if result: where.append(f"{field} = ?"); params.append(result)
+        if cursor:
+            kickoff, _, last_id = cursor.partition('|')
+            where.append("(kickoff, id) < (?, ?)"); params.extend([kickoff, last_id])
+        
+        cond = " AND ".join(where)
+        sql = f"""
+            SELECT kickoff, id, payload FROM (
+                SELECT * FROM (SELECT kickoff, id, prediction_json AS payload FROM matches
+                               WHERE {cond} ORDER BY kickoff DESC, id DESC LIMIT ?)
+                UNION ALL
+                SELECT * FROM (SELECT kickoff, id, summary_json AS payload FROM matches_archive
+                               WHERE {cond} ORDER BY kickoff DESC, id DESC LIMIT ?)
+            ) ORDER BY kickoff DESC, id DESC LIMIT ?
+        """
+        rows = self._get_read_connection().execute(sql, params + [limit + 1] + params + [limit + 1, limit + 1]).fetchall()
+        
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = f"{rows[-1][0]}|{rows[-1][1]}"
+        matches = [decode_prediction(row[2]) for row in rows]
+        if not full:
+            matches = [slim_match(m) for m in matches]
+        return matches, next_cursor
 
     def cleanup_stale_matches(self):
         """Deletes matches that are stuck in Live/HT for more than 12 hours."""
         with self._get_connection() as conn:
-            cursor = conn.cursor()
-            # If last_update is more than 12 hours ago and status is not 'Finished'
-            cursor.execute("""
-                DELETE FROM matches 
-                WHERE status != 'Finished' 
+            # If last_update is more than 12 hours ago and the match is not finished.
+            # Finished matches are kept for archive_finished_matches.
+            stale = """
+                FROM matches 
+                WHERE status NOT IN ('Finished', 'Completed')
                 AND last_update < datetime('now', '-12 hours')
-            """)
-            conn.commit()
+            """
+            if self.fts_enabled:
+                conn.execute(f"DELETE FROM match_search WHERE rowid IN (SELECT rowid {stale})")
+            if conn.execute(f"DELETE {stale}").rowcount:
+                self._bump_generation(conn.cursor())
 
-    def get_success_report(self):
-        """Calculates win rate for finished matches."""
+    def archive_finished_matches(self, retention_days=RETENTION_DAYS):
+        """
+        Moves finished matches older than retention_days (by kickoff, else last update)
+        from the hot matches table into matches_archive. Returns the number moved.
+        """
+        cutoff = (datetime.now() - timedelta(days=retention_days)).strftime("%Y-%m-%d %H:%M")
+        moved = 0
         with self._get_connection() as conn:
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            # Select matches that are finished and have a goal_pick_result
-            cursor.execute("SELECT prediction_json FROM matches WHERE status='Finished'")
-            rows = cursor.fetchall()
-            
-            total = 0
-            wins = 0
-            
+            rows = cursor.execute("""
+                SELECT id, league, home, away, sport, status, score, kickoff, result, goal_pick_result,
+                       props_pick_result, prediction_json
+                FROM matches
+                WHERE status IN ('Finished', 'Completed')
+                AND COALESCE(REPLACE(SUBSTR(NULLIF(kickoff, ''), 1, 16), 'T', ' '), last_update) < ?
+            """, (cutoff,)).fetchall()
             for row in rows:
-                data = json.loads(row['prediction_json'])
-                res = data.get('goal_pick_result')
-                if res:
-                    total += 1
-                    if res == 'won': wins += 1
-            
-            win_rate = (wins / total * 100) if total > 0 else 0
-            return {
-                'total_analyzed': total,
-                'wins': wins,
-                'win_rate': round(win_rate, 1)
-            }
+                summary = encode_prediction(slim_match(decode_prediction(row[11])), self.compact)
+                cursor.execute("""
+                    INSERT OR REPLACE INTO matches_archive
+                        (id, league, home, away, sport, status, score, kickoff, result, goal_pick_result,
+                         props_pick_result, summary_json, archived_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, row[:11] + (summary, datetime.now()))
+                if self.fts_enabled:
+                    cursor.execute("DELETE FROM match_search WHERE rowid=(SELECT rowid FROM matches WHERE id=?)", (row[0],))
+                cursor.execute("DELETE FROM matches WHERE id=?", (row[0],))
+                moved += 1
+            if moved:
+                self._bump_generation(cursor)
+        return moved
+
+    def run_maintenance(self, retention_days=RETENTION_DAYS):
+        """Archives old finished matches, then refreshes planner stats and compacts the file."""
+        moved = self.archive_finished_matches(retention_days)
+        self.downsample_odds_ticks()
+        conn = self._get_connection()
+        conn.commit()
+        conn.execute("ANALYZE")
+        conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self.set_meta('last_maintenance', datetime.now().isoformat())
+        print(f"🧹 DB maintenance: {moved} matches archived, ANALYZE + VACUUM done.")
+        return moved
+
+    def run_maintenance_if_due(self, interval_hours=MAINTENANCE_INTERVAL_HOURS):
+        """Runs run_maintenance at most once per interval (stamp kept in meta)."""
+        last = self.get_meta('last_maintenance')
+        try:
+            if last and datetime.now() - datetime.fromisoformat(last) < timedelta(hours=interval_hours):
+                return 0
+        except ValueError:
+            pass
+        return self.run_maintenance()
+
+    def record_odds_ticks(self, ticks, ts=None):
+        """
+        Bulk-appends observed prices. ticks: iterable of (match_id, source, market, side, price).
+        A tick is skipped when the latest stored price for the same key is unchanged.
+        """
+        ts = int(ts or time.time())
+        rows = [(str(t[0]), t[1], t[2], t[3], ts, float(t[4])) for t in ticks if t[4]]
+        if not rows: return 0
+        with self._get_connection() as conn:
+            before = conn.total_changes
+            conn.executemany("""
+                INSERT OR IGNORE INTO odds_ticks (match_id, source, market, side, ts, price)
+                SELECT ?1, ?2, ?3, ?4, ?5, ?6
+                WHERE COALESCE((
+                    SELECT price FROM odds_ticks
+                    WHERE match_id=?1 AND source=?2 AND market=?3 AND side=?4
+                    ORDER BY ts DESC LIMIT 1
+                ), -1) != ?6
+            """, rows)
+            return conn.total_changes - before
+
+    def downsample_odds_ticks(self, full_hours=ODDS_TICK_FULL_HOURS, bucket_seconds=ODDS_TICK_BUCKET_SECONDS,
+                              retention_days=ODDS_TICK_RETENTION_DAYS):
+        """Keeps only the last tick per bucket for old ticks and drops ticks past retention."""
+        now = int(time.time())
+        with self._get_connection() as conn:
+            conn.execute("DELETE FROM odds_ticks WHERE ts < ?", (now - retention_days * 86400,))
+            conn.execute("""
+                DELETE FROM odds_ticks
+                WHERE ts < :cutoff
+                AND ts != (
+                    SELECT MAX(t2.ts) FROM odds_ticks t2
+                    WHERE t2.match_id=odds_ticks.match_id AND t2.source=odds_ticks.source
+                    AND t2.market=odds_ticks.market AND t2.side=odds_ticks.side
+                    AND t2.ts / :bucket = odds_ticks.ts / :bucket
+                )
+            """, {'cutoff': now - full_hours * 3600, 'bucket': bucket_seconds})
+
+    def get_price_at(self, match_id, side, ts, market='ML', source=None):
+        """Last observed price at or before ts (epoch seconds), or None."""
+        sql = "SELECT price FROM odds_ticks WHERE match_id=? AND market=? AND side=? AND ts <= ?"
+        params = [str(match_id), market, side, int(ts)]
+        if source: sql += " AND source=?"; params.append(source)
+        row = self._get_read_connection().execute(sql + " ORDER BY ts DESC LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def get_odds_movement(self, match_id, side, window_seconds=86400, market='ML', source=None):
+        """Price change of one side over the last window_seconds (see get_odds_movements)."""
+        moves = self.get_odds_movements(window_seconds, market, source, match_id=match_id)
+        return next((v for (m_id, src, s), v in moves.items() if s == side), None)
+
+    def get_odds_movements(self, window_seconds=86400, market='ML', source=None, match_id=None):
+        """
+        {(match_id, source, side): {'open', 'curr', 'pct', 'ticks', 'since'}} for every key with data.
+        'open' is the price in force at the window start (or the first tick inside it),
+        'pct' the drop from open to curr in percent (positive = price shortened).
+        """
+        start = int(time.time()) - int(window_seconds)
+        where, params = "market=?", [market]
+        if source: where += " AND source=?"; params.append(source)
+        if match_id is not None: where += " AND match_id=?"; params.append(str(match_id))
+        rows = self._get_read_connection().execute(f"""
+            SELECT match_id, source, side, ts, price FROM odds_ticks WHERE {where} AND ts >= ?
+            UNION ALL
+            SELECT match_id, source, side, MAX(ts), price FROM odds_ticks WHERE {where} AND ts < ?
+            GROUP BY match_id, source, side
+            ORDER BY 1, 2, 3, 4
+        """, params + [start] + params + [start]).fetchall()
+        
+        moves = {}
+        for m_id, src, side, ts, price in rows:
+            key = (m_id, src, side)
+            mv = moves.get(key)
+            if mv is None:
+                moves[key] = {'open': price, 'curr': price, 'pct': 0.0, 'ticks': 1, 'since': ts}
+            else:
+                mv['curr'] = price
+                mv['ticks'] += 1
+        for mv in moves.values():
+            if mv['open'] > 0:
+                mv['pct'] = round((mv['open'] - mv['curr']) / mv['open'] * 100, 1)
+        return moves
+
+    def _add_pick_stats(self, cursor, match_data):
+        cursor.executemany("""
+            INSERT INTO pick_stats (day, league, sport, market, conf_bucket, total, wins)
+            VALUES (?, ?, ?, ?, ?, 1, ?)
+            ON CONFLICT(day, league, sport, market, conf_bucket) DO UPDATE SET
+                total=total + 1,
+                wins=wins + excluded.wins
+        """, pick_stat_rows(match_data))
+
+    def _rebuild_pick_stats(self, cursor):
+        cursor.execute("DELETE FROM pick_stats")
+        for (value,) in cursor.execute("""
+            SELECT prediction_json FROM matches WHERE status IN ('Finished', 'Completed')
+            UNION ALL SELECT summary_json FROM matches_archive
+        """).fetchall():
+            self._add_pick_stats(cursor, decode_prediction(value))
+
+    def rebuild_pick_stats(self):
+        """Recomputes pick_stats from every stored finished match (hot + archive)."""
+        with self._get_connection() as conn:
+            self._rebuild_pick_stats(conn.cursor())
+
+    def get_pick_stats(self, sport=None, league=None, market=None, days=None, group_by=('league', 'market')):
+        """
+        Win rates from the pick_stats aggregates, grouped by any of PICK_STATS_GROUPS.
+        Cost is proportional to the number of buckets, not matches.
+        Raises ValueError for a group outside PICK_STATS_GROUPS or a market outside PICK_MARKETS.
+        """
+        unknown = [g for g in group_by if g not in PICK_STATS_GROUPS]
+        if unknown:
+            raise ValueError(f"Unknown group: {', '.join(unknown)}")
+        if market and market not in PICK_MARKETS:
+            raise ValueError(f"Unknown market: {market}")
+        group_by = list(group_by)
+        where, params = [], []
+        if sport: where.append("sport=?"); params.append(sport)
+        if league: where.append("league=?"); params.append(league)
+        if market: where.append("market=?"); params.append(market)
+        if days:
+            where.append("day >= ?")
+            params.append((datetime.now() - timedelta(days=int(days))).strftime("%Y-%m-%d"))
+        
+        cols = ", ".join(group_by)
+        sql = f"SELECT {cols + ', ' if cols else ''}SUM(total), SUM(wins) FROM pick_stats"
+        if where: sql += " WHERE " + " AND ".join(where)
+        if cols: sql += f" GROUP BY {cols} ORDER BY {cols}"
+        
+        report = []
+        for row in self._get_read_connection().execute(sql, params):
+            total, wins = row[-2] or 0, row[-1] or 0
+            if not total: continue
+            item = dict(zip(group_by, row[:-2]))
+            item.update({'total': total, 'wins': wins, 'win_rate': round(wins / total * 100, 1)})
+            report.append(item)
+        return report
+
+    def _index_match(self, cursor, match_data):
+        row = cursor.execute("SELECT rowid FROM matches WHERE id=?", (match_data.get('id'),)).fetchone()
+        if not row: return
+        cursor.execute("DELETE FROM match_search WHERE rowid=?", (row[0],))
+        cursor.execute("""
+            INSERT INTO match_search (rowid, id, sport, home, away, league, aliases, picks)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (row[0], match_data.get('id'), match_data.get('sport', 'soccer')) + search_document(match_data))
+
+    def _rebuild_search_index(self, cursor):
+        cursor.execute("DELETE FROM match_search")
+        for (value,) in cursor.execute("SELECT prediction_json FROM matches").fetchall():
+            self._index_match(cursor, decode_prediction(value))
+
+    def search_matches(self, query, limit=10, sport=None, columns=SEARCH_COLUMNS, prefix=True, match_all=False):
+        """
+        Ranked (bm25) lookup of matches by team names, aliases, league and pick text.
+        Query and index are folded like normalize_name, so 'Besiktas' finds 'Beşiktaş'.
+        prefix=True treats every word as a prefix (typeahead); match_all requires every word.
+        """
+        tokens = search_tokens(query)
+        if not tokens: return []
+        
+        if not self.fts_enabled:
+            hits = []
+            for m in self.get_all_matches():
+                if sport and m.get('sport') != sport: continue
+                text = fold_search_text(" ".join(str(m.get(c) or '') for c in ('home', 'away', 'league')))
+                found = [t for t in tokens if t in text]
+                if found and (not match_all or len(found) == len(tokens)):
+                    hits.append((len(found), m))
+            hits.sort(key=lambda x: x[0], reverse=True)
+            return [m for _, m in hits[:limit]]
+        
+        terms = [f'"{t}"' + ('*' if prefix else '') for t in tokens]
+        expr = (" AND " if match_all else " OR ").join(terms)
+        cols = [c for c in columns if c in SEARCH_COLUMNS]
+        if cols and tuple(cols) != SEARCH_COLUMNS:
+            expr = "{" + " ".join(cols) + "} : (" + expr + ")"
+        
+        sql = f"""
+            SELECT m.prediction_json FROM match_search s JOIN matches m ON m.rowid = s.rowid
+            WHERE match_search MATCH ? {"AND s.sport = ?" if sport else ""}
+            ORDER BY bm25(match_search, {", ".join(str(w) for w in SEARCH_WEIGHTS)})
+            LIMIT ?
+        """
+        params = [expr] + ([sport] if sport else []) + [int(limit)]
+        return [decode_prediction(row[0]) for row in self._get_read_connection().execute(sql, params)]
+
+    def get_success_report(self):
+        """Calculates win rate for finished matches (goal picks)."""
+        stats = self.get_pick_stats(market='GOAL', group_by=())
+        total = stats[0]['total'] if stats else 0
+        wins = stats[0]['wins'] if stats else 0
+        
+        win_rate = (wins / total * 100) if total > 0 else 0
+        return {
+            'total_analyzed': total,
+            'wins': wins,
+            'win_rate': round(win_rate, 1)
+        }
 
 db_manager = DatabaseManager()
@@ -0,0 +1,77 @@
+import json
+import os
+import threading
+import time
+
+HEARTBEAT_SECONDS = 15
+POLL_SECONDS = 2
+# An open stream holds a gthread thread, so streams are short: closed after this long,
+# EventSource reconnects RETRY_MS later with its Last-Event-ID and gets the missed deltas
+MAX_STREAM_SECONDS = 25
+RETRY_MS = 1000
+# Open streams per worker process; the rest of the worker's threads stay free for
+# ordinary requests. Over the limit /api/stream answers 503 and the dashboard polls.
+MAX_STREAMS = int(os.environ.get("KAHIN_MAX_STREAMS", 4))
+
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+
+def acquire_stream_slot():
+    """Reserves one of the MAX_STREAMS slots without waiting; False when all are taken."""
+    return _stream_slots.acquire(blocking=False)
+
+
+def release_stream_slot():
+    _stream_slots.release()
+
+
+def format_event(data, event=None, event_id=None):
+    lines = []
+    if event_id is not None: lines.append(f"id: {event_id}")
+    if event: lines.append(f"event: {event}")
+    lines.append("data: " + json.dumps(data, ensure_ascii=False, separators=(',', ':')))
+    return "\n".join(lines) + "\n\n"
+
+
+def _for_sport(changes, sport):
+    return [c for c in changes if not sport or c.get('sport') == sport]
+
+
+def stream_match_events(cache, sport=None, last_event_id=None):
+    """
+    Server-Sent Events generator: per-match deltas of the fixtures list as new
+    snapshot generations land. Event ids are generations, so a reconnecting client
+    gets the missed deltas replayed, or a 'reset' when they are no longer logged.
+    """
+    yield f"retry: {RETRY_MS}\n\n"
+
+    try:
+        generation = int(last_event_id)
+    except (TypeError, ValueError):
+        generation = None
+
+    current = cache.get().generation
+    if generation is None:
+        # Fresh subscriber: tell it which generation the stream starts from
+        yield format_event({'generation': current}, event='sync', event_id=current)
+        generation = current
+
+    started = last_beat = time.monotonic()
+    while time.monotonic() - started < MAX_STREAM_SECONDS:
+        deltas = cache.deltas_since(generation)
+        if deltas is None:
+            generation = cache.get().generation
+            yield format_event({'generation': generation}, event='reset', event_id=generation)
+            last_beat = time.monotonic()
+        elif deltas:
+            for to_gen, changes in deltas:
+                changes = _for_sport(changes, sport)
+                if changes:
+                    yield format_event({'generation': to_gen, 'changes': changes}, event='delta', event_id=to_gen)
+                    last_beat = time.monotonic()
+                generation = to_gen
+
+        if time.monotonic() - last_beat >= HEARTBEAT_SECONDS:
+            yield ": heartbeat\n\n"
+            last_beat = time.monotonic()
+        time.sleep(POLL_SECONDS)
@@ -33,7 +33,7 @@ def run():
     
     print(f"✅ Found {len(matches)} historical matches.")
     
-    print("💾 Saving to training_data.csv...")
+    print("💾 Saving to the training store...")
     save_training_data(matches)
     
     print("🚀 Bulk Data Collection Complete!")
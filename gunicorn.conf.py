@@ -0,0 +1,25 @@
+# Production serving: gunicorn -c gunicorn.conf.py app:app
+# Workers read the shared mmapped snapshot written by the ingestion process
+# (python launcher.py / data_fetcher.py with KAHIN_SHARED_SNAPSHOT=1).
+import multiprocessing
+import os
+
+os.environ.setdefault("KAHIN_SHARED_SNAPSHOT", "1")
+# Chat follow-up context must survive a request landing on another worker
+# (stored in kahin_sessions.db, not the ingest-locked kahin_data.db)
+os.environ.setdefault("KAHIN_SESSION_STORE", "sqlite")
+
+bind = os.environ.get("KAHIN_BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("KAHIN_WORKERS", multiprocessing.cpu_count() * 2 + 1))
+# --- CAPACITY ---
+# gthread: every request, including an open /api/stream (SSE), holds one thread.
+# A stream lasts at most event_stream.MAX_STREAM_SECONDS (25 s) and then reconnects
+# with Last-Event-ID; at most KAHIN_MAX_STREAMS (4) streams per worker, so the other
+# threads - 8 - 4 = 4 per worker by default - always serve pages and API calls.
+# Live dashboards = workers * KAHIN_MAX_STREAMS (e.g. 9 * 4 = 36 on 4 cores); beyond
+# that /api/stream returns 503 and those dashboards poll every 30 s instead.
+# Raise KAHIN_THREADS together with KAHIN_MAX_STREAMS for more live clients.
+worker_class = "gthread"
+threads = int(os.environ.get("KAHIN_THREADS", 8))
+timeout = 120
+raw_env = ["KAHIN_SHARED_SNAPSHOT=1", "KAHIN_SESSION_STORE=sqlite"]
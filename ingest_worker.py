@@ -0,0 +1,86 @@
+import multiprocessing
+import threading
+import time
+from datetime import datetime
+
+# Seconds between two ingestion cycles
+INGEST_INTERVAL = 60
+# Seconds before a dead worker is restarted (same as keep_alive.py)
+RESTART_DELAY = 5
+
+# The worker talks to the web tier only through SQLite: every committed write bumps
+# meta.generation, which SnapshotCache polls (and, in shared mode, the snapshot file
+# pointer moves). meta.last_ingest records the end of the last successful cycle.
+
+
+def run_ingest_loop():
+    """Ingestion loop; runs in its own process so scraping never holds the web server's GIL."""
+    # Imported here: the spawned child should not pay for (or share) the parent's imports
+    from data_fetcher import run_elite_update
+    from db_manager import db_manager
+
+    while True:
+        print("\n⏳ Veri güncelleme döngüsü başladı...")
+        try:
+            run_elite_update()
+            db_manager.set_meta('last_ingest', datetime.now().isoformat(timespec='seconds'))
+            print(f"✅ Güncelleme tamamlandı. {INGEST_INTERVAL} saniye bekleme...")
+        except Exception as e:
+            print(f"❌ HATA: {e}")
+
+        time.sleep(INGEST_INTERVAL)
+
+
+class IngestSupervisor:
+    """
+    Starts run_ingest_loop in a child process and restarts it RESTART_DELAY seconds
+    after it exits, whatever the exit code (keep_alive.py semantics).
+    """
+
+    def __init__(self, target=run_ingest_loop):
+        self.target = target
+        # spawn: never fork a process holding open SQLite connections and Flask threads
+        self._ctx = multiprocessing.get_context('spawn')
+        self._process = None
+        self._stopping = threading.Event()
+        self._thread = None
+        self.restarts = 0
+
+    def start(self):
+        self._spawn()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def _spawn(self):
+        self._process = self._ctx.Process(target=self.target, name="kahin-ingest", daemon=True)
+        self._process.start()
+        print(f"🛠️ Veri işçisi başlatıldı (PID {self._process.pid})")
+
+    def _watch(self):
+        while not self._stopping.is_set():
+            self._process.join(timeout=1)
+            if self._process.is_alive() or self._stopping.is_set():
+                continue
+            code = self._process.exitcode
+            if code != 0:
+                print(f"⚠️  Veri işçisi hata ile kapandı (Kod: {code}). Yeniden başlatılıyor...")
+            else:
+                print("ℹ️  Veri işçisi normal şekilde kapandı. Kural gereği yeniden başlatılıyor...")
+            if self._stopping.wait(RESTART_DELAY):
+                break
+            self.restarts += 1
+            self._spawn()
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def stop(self, timeout=5):
+        self._stopping.set()
+        if self._process is not None and self._process.is_alive():
+            self._process.terminate()
+            self._process.join(timeout)
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    run_ingest_loop()
@@ -4,8 +4,8 @@ import webbrowser
 import os
 import sys
 import subprocess
-from app import app
-from data_fetcher import run_elite_update
+import multiprocessing
+from ingest_worker import IngestSupervisor
 
 # --- LOGO & HEADER ---
 LOGO = """
@@ -23,23 +23,15 @@ def start_browser():
 
 def run_flask():
     """Run Flask app."""
+    # Imported here: the spawned ingest process re-imports this module and must not load Flask
+    from app import app
     # Turn off debug reloader for Thread safety
     app.run(debug=False, use_reloader=False, port=5000)
 
-def run_data_loop():
-    """Run data fetcher in a loop."""
-    while True:
-        print("\n⏳ Veri güncelleme döngüsü başladı...")
-        try:
-            run_elite_update()
-            print("✅ Güncelleme tamamlandı. 60 saniye bekleme...")
-        except Exception as e:
-            print(f"❌ HATA: {e}")
-        
-        # Wait 60 seconds before next check
-        time.sleep(60)
-
 if __name__ == "__main__":
+    # Required for multiprocessing in the PyInstaller build
+    multiprocessing.freeze_support()
+
     # Force working directory to where the exe is (for PyInstaller)
     if getattr(sys, 'frozen', False):
         application_path = os.path.dirname(sys.executable)
@@ -67,9 +59,9 @@ if __name__ == "__main__":
     flask_thread = threading.Thread(target=run_flask, daemon=True)
     flask_thread.start()
 
-    # 2. Start Data Fetcher in Thread
-    data_thread = threading.Thread(target=run_data_loop, daemon=True)
-    data_thread.start()
+    # 2. Start Data Fetcher in its own process (restarted 5s after it dies)
+    ingest = IngestSupervisor()
+    ingest.start()
 
     # 3. Open Browser
     start_browser()
@@ -80,4 +72,7 @@ if __name__ == "__main__":
             time.sleep(1)
     except KeyboardInterrupt:
         print("\n🛑 Sistem kapatılıyor...")
+        ingest.stop()
+        from db_manager import db_manager
+        db_manager.close()
         sys.exit()
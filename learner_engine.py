@@ -1,34 +1,35 @@
-import csv
 import json
-import os
 
 TIMESTAMP_FILE = "last_learned_at.txt"
-DATA_FILE = "training_data.csv"
 WEIGHTS_FILE = "model_weights.json"
 
-def run_learner():
-    print("🧠 AI LEARNER ENGINE STARTED...")
-    
-    if not os.path.exists(DATA_FILE):
-        print("No training data found. Collect more matches first.")
-        return
+def load_league_performance():
+    """Per-league pick results from the DB aggregates (pick_stats, market MS)."""
+    try:
+        from db_manager import db_manager
+        rows = db_manager.get_pick_stats(market='MS', group_by=('league',))
+    except Exception as e:
+        print(f"Stats Load Error: {e}")
+        return {}
+    return {r['league']: {'wins': r['wins'], 'total': r['total'], 'losses': r['total'] - r['wins']} for r in rows}
 
-    # 1. Load Data
-    matches = []
-    with open(DATA_FILE, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            matches.append(row)
+def load_league_performance_samples():
+    """Fallback: recompute per-league results from the training store (one row per match)."""
+    try:
+        from training_store import get_training_store, COLUMNS
+        matches = [dict(zip(COLUMNS, row)) for row in get_training_store().rows()]
+    except Exception as e:
+        print(f"Training Data Load Error: {e}")
+        return {}
     
     print(f"Loaded {len(matches)} matches for analysis.")
     
-    # 2. Analyze Performance by League
     league_performance = {}
     
     for m in matches:
         league = m['league']
         result = m['result']
-        pred = m['prediction']
+        pred = m['prediction'] or ''
         
         if league not in league_performance:
             league_performance[league] = {'wins': 0, 'total': 0, 'losses': 0}
@@ -40,6 +41,21 @@ def run_learner():
                 league_performance[league]['wins'] += 1
             else:
                 league_performance[league]['losses'] += 1
+    return league_performance
+
+def run_learner():
+    print("🧠 AI LEARNER ENGINE STARTED...")
+    
+    # 1-2. Performance by League (DB aggregates first, training samples only as fallback)
+    league_performance = load_league_performance()
+    if league_performance:
+        print(f"Loaded {len(league_performance)} leagues from pick_stats.")
+    else:
+        league_performance = load_league_performance_samples()
+    
+    if not league_performance:
+        print("No training data found. Collect more matches first.")
+        return
 
     # 3. Generate Weights
     weights = {}
@@ -0,0 +1,140 @@
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from db_manager import db_manager, is_active_match, is_history_match
+from coupon_engine import market_candidates, build_coupons
+
+# Seconds between two generation checks against the DB
+GENERATION_CHECK_INTERVAL = 1.0
+
+# Fields pushed to stream clients when they change on an active match
+DELTA_FIELDS = ('time', 'status', 'score', 'odds', 'recommendation', 'reasoning',
+                'value_found', 'dropping_odds', 'result', 'pro_stats')
+
+# Number of generation deltas kept for clients reconnecting with a Last-Event-ID
+DELTA_LOG_SIZE = 64
+
+
+def diff_snapshots(old, new):
+    """Per-match changes between the active views of two snapshots."""
+    old_active = {m.get('id'): m for m in old.active}
+    changes = []
+    for m in new.active:
+        prev = old_active.pop(m.get('id'), None)
+        if prev is None:
+            changes.append({'op': 'add', 'id': m.get('id'), 'sport': m.get('sport'), 'match': m})
+            continue
+        fields = {k: m.get(k) for k in DELTA_FIELDS if m.get(k) != prev.get(k)}
+        if fields:
+            changes.append({'op': 'update', 'id': m.get('id'), 'sport': m.get('sport'), 'fields': fields})
+    for m_id, prev in old_active.items():
+        changes.append({'op': 'remove', 'id': m_id, 'sport': prev.get('sport')})
+    return changes
+
+
+def replay_deltas(log, generation, current):
+    """Entries of a delta log after `generation` as [(to_generation, changes), ...]; None on a gap."""
+    if generation == current:
+        return []
+    entries = [d for d in log if d[1] > generation]
+    if generation > current or not entries or entries[0][0] > generation:
+        return None
+    return [(to_gen, changes) for _, to_gen, changes in entries]
+
+
+class MatchSnapshot:
+    """
+    Decoded matches of one DB generation plus prebuilt views.
+    Shared by all request threads: treat every list and dict in it as read-only.
+    """
+
+    def __init__(self, generation, matches, archived=(), now=None):
+        now = now or datetime.now()
+        self.generation = generation
+        self.day = now.date()
+        self.built_at = time.time()
+        # Changes with the data generation and with the day (active views depend on it)
+        self.version = f"{generation}.{self.day:%Y%m%d}"
+
+        self.matches = matches
+        self.by_id = {m.get('id'): m for m in matches}
+
+        self.active = [m for m in matches if is_active_match(m, now)]
+        self.history = [m for m in matches if is_history_match(m)] + list(archived)
+
+        self.active_by_sport = self._group(self.active, 'sport')
+        self.history_by_sport = self._group(self.history, 'sport')
+        self.by_status = self._group(matches, 'status')
+        self.by_league = self._group(self.active, 'league')
+
+        # Per-market top-K coupon candidates and the coupons built from them
+        self.coupon_candidates = market_candidates(self.active)
+        self.coupons = build_coupons(self.coupon_candidates)
+
+    @staticmethod
+    def _group(matches, key):
+        views = {}
+        for m in matches:
+            views.setdefault(m.get(key), []).append(m)
+        return views
+
+    def fixtures(self, sport=None):
+        return self.active_by_sport.get(sport, []) if sport else self.active
+
+    def history_for(self, sport=None):
+        return self.history_by_sport.get(sport, []) if sport else self.history
+
+
+class SnapshotCache:
+    """
+    Holds the current MatchSnapshot and rebuilds it only when the DB generation
+    counter (bumped on every committed write) or the calendar day changes.
+    """
+
+    def __init__(self, db, check_interval=GENERATION_CHECK_INTERVAL):
+        self.db = db
+        self.check_interval = check_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        # (from_generation, to_generation, changes) of the latest rebuilds
+        self._deltas = deque(maxlen=DELTA_LOG_SIZE)
+
+    def get(self):
+        snap = self._snapshot
+        now = time.monotonic()
+        if snap is not None and now - self._checked_at < self.check_interval and snap.day == datetime.now().date():
+            return snap
+
+        with self._lock:
+            snap = self._snapshot
+            generation = self.db.get_generation()
+            self._checked_at = time.monotonic()
+            if snap is None or snap.generation != generation or snap.day != datetime.now().date():
+                prev = snap
+                snap = MatchSnapshot(generation, self.db.get_all_matches(), self.db.get_archived_matches())
+                if prev is not None and prev.generation != generation:
+                    self._deltas.append((prev.generation, generation, diff_snapshots(prev, snap)))
+                self._snapshot = snap
+                self.rebuilds += 1
+            return snap
+
+    def deltas_since(self, generation):
+        """
+        [(to_generation, changes), ...] after the given generation, or None when the
+        log no longer reaches back that far (client must reload the full list).
+        """
+        return replay_deltas(list(self._deltas), generation, self.get().generation)
+
+    def delta_log(self):
+        """[(from_generation, to_generation, changes), ...], oldest first (for the shared file)."""
+        return list(self._deltas)
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+
+
+snapshot_cache = SnapshotCache(db_manager)
@@ -0,0 +1,86 @@
+import os
+import threading
+import warnings
+
+import numpy as np
+
+MODEL_FILE = "model.pkl"
+ENCODER_FILE = "encoder.pkl"
+
+# Column order the forest was trained on (train_model.FEATURES)
+FEATURES = ('league_code', 'home_odds', 'away_odds', 'confidence')
+# Same fallbacks the per-match scoring used: unknown league -> 0, missing price -> 1.50
+UNKNOWN_LEAGUE_CODE = 0
+DEFAULT_ODDS = 1.50
+
+
+def _odds(value):
+    return float(value) if isinstance(value, (int, float)) else DEFAULT_ODDS
+
+
+class ModelServer:
+    """
+    Random Forest of train_model.py, loaded once per process (and again only when
+    model.pkl is replaced on disk). Leagues are encoded through a dict built from
+    encoder.classes_, and a whole cycle is scored with one predict_proba call.
+    """
+
+    def __init__(self, model_file=MODEL_FILE, encoder_file=ENCODER_FILE):
+        self.model_file = model_file
+        self.encoder_file = encoder_file
+        self.model = None
+        self.league_codes = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self.stats = {'loads': 0, 'batches': 0, 'rows': 0}
+
+    def load(self):
+        """The model, (re)loaded if model.pkl changed; None when there is no trained model."""
+        try:
+            mtime = os.path.getmtime(self.model_file)
+        except OSError:
+            self.model, self.league_codes, self._mtime = None, {}, None
+            return None
+        if mtime == self._mtime:
+            return self.model
+        with self._lock:
+            if mtime != self._mtime:
+                import joblib  # only the ingest side ever scores
+                model = joblib.load(self.model_file)
+                encoder = joblib.load(self.encoder_file)
+                self.league_codes = {str(name): code for code, name in enumerate(encoder.classes_)}
+                self.model = model
+                self._mtime = mtime
+                self.stats['loads'] += 1
+                print(f"🧠 AI modeli yüklendi ({len(self.league_codes)} lig)")
+        return self.model
+
+    def features(self, rows):
+        """(n, 4) float matrix in FEATURES order from dicts with league/home_odds/away_odds/confidence."""
+        codes = self.league_codes
+        x = np.empty((len(rows), len(FEATURES)), dtype=np.float64)
+        for i, row in enumerate(rows):
+            x[i, 0] = codes.get(str(row['league']), UNKNOWN_LEAGUE_CODE)
+            x[i, 1] = _odds(row['home_odds'])
+            x[i, 2] = _odds(row['away_odds'])
+            x[i, 3] = row['confidence']
+        return x
+
+    def predict_win_probs(self, rows):
+        """Win probability (0-100) per row, or None when no model is available."""
+        if not rows:
+            return []
+        model = self.load()
+        if model is None:
+            return None
+        x = self.features(rows)
+        with warnings.catch_warnings():
+            # Fitted on a DataFrame; the plain array has the same column order
+            warnings.filterwarnings("ignore", message="X does not have valid feature names")
+            probs = model.predict_proba(x)[:, 1] * 100
+        self.stats['batches'] += 1
+        self.stats['rows'] += len(rows)
+        return probs.tolist()
+
+
+model_server = ModelServer()
@@ -0,0 +1,118 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from flask import Response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+# Bodies kept per generation; keys come from client query strings, so the cache is an LRU
+MAX_BODIES = 256
+
+
+class CachedBody:
+    """One serialized JSON payload with its precompressed variants and ETags."""
+
+    def __init__(self, tag, payload):
+        self.identity = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        self.etag = f'"{tag}-{hashlib.sha1(self.identity).hexdigest()[:12]}"'
+        self.variants = {}
+        if len(self.identity) >= MIN_COMPRESS_SIZE:
+            self.variants['gzip'] = gzip.compress(self.identity, 6)
+            if brotli is not None:
+                self.variants['br'] = brotli.compress(self.identity, quality=5)
+
+    @classmethod
+    def from_parts(cls, identity, variants, etag):
+        """Already serialized body (e.g. slices of a shared snapshot file)."""
+        body = cls.__new__(cls)
+        body.identity = identity
+        body.variants = variants
+        body.etag = etag
+        return body
+
+    def etag_for(self, encoding):
+        # Each content-coding is a different representation -> its own strong ETag
+        return self.etag if encoding is None else self.etag[:-1] + f'-{encoding}"'
+
+    def all_etags(self):
+        return {self.etag} | {self.etag_for(enc) for enc in self.variants}
+
+
+class ResponseCache:
+    """
+    Serialized + precompressed API bodies, cached per snapshot generation and
+    filter combination. Entries of older generations are dropped on first miss;
+    within a generation at most max_bodies are kept, least recently used first out.
+    """
+
+    def __init__(self, max_bodies=MAX_BODIES):
+        self.max_bodies = max_bodies
+        self._bodies = OrderedDict()
+        self._generation = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_body(self, generation, key, build):
+        with self._lock:
+            if generation != self._generation:
+                self._bodies = OrderedDict()
+                self._generation = generation
+            body = self._bodies.get(key)
+            if body is not None:
+                self._bodies.move_to_end(key)
+                self.hits += 1
+                return body
+        # Build outside the lock; a concurrent duplicate build is harmless
+        body = CachedBody(f"g{generation}", build())
+        with self._lock:
+            self.misses += 1
+            if generation == self._generation:
+                body = self._bodies.setdefault(key, body)
+                while len(self._bodies) > self.max_bodies:
+                    self._bodies.popitem(last=False)
+                    self.evictions += 1
+        return body
+
+    def respond(self, generation, key, build):
+        """ETag/304-aware, content-negotiated JSON response for a cached body."""
+        return self.send(self.get_body(generation, key, build))
+
+    def send(self, body):
+        """Response for a CachedBody: 304 on a matching If-None-Match, else the best encoding."""
+        if_none_match = request.headers.get('If-None-Match', '')
+        if if_none_match:
+            sent = {t.strip() for t in if_none_match.split(',')}
+            matched = sent & body.all_etags()
+            if '*' in sent or matched:
+                return self._response(b'', 304, min(matched) if matched else body.etag, None)
+
+        encoding = None
+        accepted = request.accept_encodings
+        for enc in ('br', 'gzip'):
+            if enc in body.variants and accepted[enc]:
+                encoding = enc
+                break
+        data = body.variants[encoding] if encoding else body.identity
+        return self._response(data, 200, body.etag_for(encoding), encoding)
+
+    @staticmethod
+    def _response(data, status, etag, encoding):
+        resp = Response(bytes(data), status=status, mimetype='application/json')
+        resp.headers['ETag'] = etag
+        resp.headers['Cache-Control'] = 'no-cache'
+        resp.headers['Vary'] = 'Accept-Encoding'
+        if encoding:
+            resp.headers['Content-Encoding'] = encoding
+        return resp
+
+
+response_cache = ResponseCache()
@@ -1,14 +1,15 @@
+import json
 import requests
 import time
 import math
 import random
+import threading
 from datetime import datetime, timedelta
-import joblib
-import pandas as pd
 import os
 import sys
 import codecs
 from sofascore_adapter import SofaScoreAdapter
+from text_utils import normalize_name
 
 # Force UTF-8 for Windows console redirection
 if sys.platform == "win32":
@@ -19,18 +20,6 @@ if sys.platform == "win32":
 
 # --- PRO STAT ENGINE (The "Math" Brain) ---
 
-def normalize_name(name):
-    if not name: return ""
-    name = name.lower()
-    replacements = {
-        'ı': 'i', 'ü': 'u', 'ö': 'o', 'ş': 's', 'ç': 'c', 'ğ': 'g',
-        'İ': 'i', 'Ü': 'u', 'Ö': 'o', 'Ş': 's', 'Ç': 'c', 'Ğ': 'g'
-    }
-    for k, v in replacements.items():
-        name = name.replace(k, v)
-    return name.strip()
-
-
 class StatEngine:
     def __init__(self):
         # Professional League Baselines (Goals / Points avg)
@@ -619,8 +608,39 @@ class StatEngine:
         return preds
 
 
-stat_engine = StatEngine()
-sofa_adapter = SofaScoreAdapter()
+# --- SHARED ENGINES (built on first use) ---
+# StatEngine reads model_weights.json and SofaScoreAdapter sofascore_data.json;
+# importers that only need fetch_standings/fetch_h2h_data never pay for them.
+_stat_engine = None
+_sofa_adapter = None
+_engines_lock = threading.Lock()
+
+
+def get_stat_engine():
+    global _stat_engine
+    if _stat_engine is None:
+        with _engines_lock:
+            if _stat_engine is None:
+                _stat_engine = StatEngine()
+    return _stat_engine
+
+
+def get_sofa_adapter():
+    global _sofa_adapter
+    if _sofa_adapter is None:
+        with _engines_lock:
+            if _sofa_adapter is None:
+                _sofa_adapter = SofaScoreAdapter()
+    return _sofa_adapter
+
+
+def __getattr__(name):
+    # Old `scraper_engine.stat_engine` / `from scraper_engine import sofa_adapter` still work
+    if name == 'stat_engine':
+        return get_stat_engine()
+    if name == 'sofa_adapter':
+        return get_sofa_adapter()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_stat(team_data, abbr):
@@ -706,7 +726,7 @@ def fetch_team_form(team_name, league_code, sport='soccer'):
     e.g. ("W-W-D-L-W", 3) where Win=1, Draw=0.5, Loss=-1
     """
     try:
-        adapter = sofa_adapter
+        adapter = get_sofa_adapter()
         team_id = SOFA_TEAM_CACHE.get(team_name)
         
         if not team_id:
@@ -738,9 +758,43 @@ def scrape_history():
     return fetch_matches_for_dates(dates_to_fetch, LEAGUES)
 
 
+# Window for dropping-odds detection on locally recorded ticks
+ODDS_MOVE_WINDOW = 24 * 3600
+
+
 # --- STANDINGS API UPGRADE (Tier 1 Data) ---
 STANDINGS_CACHE = {}
 TEAM_ID_MAP = {} # Map team names to (id, league_code)
+# Ingest runs in its own process: it persists TEAM_ID_MAP here (meta table) so the
+# web process's H2H fallback can use the ids without refetching every standings table
+TEAM_ID_META_KEY = "espn_team_ids"
+
+
+def save_team_ids():
+    """Stores TEAM_ID_MAP in the DB meta table (called by ingest after each cycle)."""
+    if not TEAM_ID_MAP:
+        return
+    from db_manager import db_manager
+    db_manager.set_meta(TEAM_ID_META_KEY, json.dumps(TEAM_ID_MAP, ensure_ascii=False, separators=(',', ':')))
+
+
+def load_team_ids():
+    """Merges the ids persisted by ingest into TEAM_ID_MAP; entries fetched here win."""
+    from db_manager import db_manager
+    try:
+        stored = json.loads(db_manager.get_meta(TEAM_ID_META_KEY) or '{}')
+    except ValueError:
+        return
+    for name, (t_id, league_code) in stored.items():
+        TEAM_ID_MAP.setdefault(name, (t_id, league_code))
+
+
+def find_team_id(name_norm):
+    """(id, league_code) of the first TEAM_ID_MAP name matching name_norm, else None."""
+    for name, info in TEAM_ID_MAP.items():
+        if name_norm == name or name_norm in name or name in name_norm:
+            return info
+    return None
 
 
 def fetch_standings(league_code, sport='soccer'):
@@ -821,7 +875,7 @@ def fetch_h2h_data(event_id, home=None, away=None):
     
     if home and away:
         try:
-            adapter = sofa_adapter
+            adapter = get_sofa_adapter()
             resolved_id = adapter.get_event_id(home, away)
             if resolved_id:
                 event_id = resolved_id
@@ -837,7 +891,7 @@ def fetch_h2h_data(event_id, home=None, away=None):
     }
     
     try:
-        res = sofa_adapter.scraper.get(url, headers=headers, timeout=5)
+        res = get_sofa_adapter().scraper.get(url, headers=headers, timeout=5)
         if res.status_code == 200:
             data = res.json()
             matches_raw = data.get('events', [])
@@ -864,11 +918,10 @@ def fetch_h2h_data(event_id, home=None, away=None):
     try:
         h_norm = normalize_name(home)
         a_norm = normalize_name(away)
-        h_info = None
-        
-        for name, info in TEAM_ID_MAP.items():
-            if h_norm == name or h_norm in name or name in h_norm:
-                h_info = info; break
+        h_info = find_team_id(h_norm)
+        if h_info is None:
+            load_team_ids()
+            h_info = find_team_id(h_norm)
         
         if h_info:
             t_id, l_code = h_info
@@ -927,19 +980,28 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
     print(
         f"DEBUG: STARTING FETCH for {len(LEAGUES)} leagues and {len(dates_to_fetch)} dates")
     matches = []
+    pending = []  # (match, state) awaiting the batched AI score
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
     }
-    adapter = sofa_adapter # Use global instance for shared cache
+    adapter = get_sofa_adapter() # Use global instance for shared cache
+    engine = get_stat_engine()
+
+    # --- LOCAL ODDS HISTORY (ticks recorded by previous cycles) ---
+    from db_manager import db_manager
+    odds_ticks = []
+    try:
+        local_moves = db_manager.get_odds_movements(window_seconds=ODDS_MOVE_WINDOW)
+    except Exception as e:
+        print(f"Odds History Load Error: {e}")
+        local_moves = {}
 
     for league in LEAGUES:
         # Pre-fetch Standings for this league
         league_standings = fetch_standings(league['code'], league['sport'])
 
         for date_str in dates_to_fetch:
-            url = f"http://site.api.espn.com/apis/site/v2/sports/{
-    league['sport']}/{
-        league['code']}/scoreboard?dates={date_str}"
+            url = f"http://site.api.espn.com/apis/site/v2/sports/{league['sport']}/{league['code']}/scoreboard?dates={date_str}"
             try:
                 # 1. TRY ESPN Scoreboard First
                 espn_events = []
@@ -1206,7 +1268,7 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
                         except: pass
 
                         # --- SOFASCORE LOOKUP & REFRESH ---
-                        sofa_data = sofa_adapter.get_deep_stats(home_team, away_team)
+                        sofa_data = adapter.get_deep_stats(home_team, away_team)
                         missing_players = None
                         
                         # If NOT found in adapter, try to discover it from ss_events
@@ -1227,18 +1289,19 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
                                             'league_id': se.get('tournament', {}).get('id')
                                         }
                                         # Save to adapter cache
-                                        sofa_adapter.update_match_data(se['id'], sofa_data)
+                                        adapter.update_match_data(se['id'], sofa_data)
                                         break
                         
                         # PHASE 4: Fetch Missing Players if we have an event ID
                         if sofa_data and sofa_data.get('id'):
-                            missing_players = sofa_adapter.get_missing_players(sofa_data['id'])
+                            missing_players = adapter.get_missing_players(sofa_data['id'])
 
 
                         # --- ODDS PARSING (MOVED UP FOR PREDICTION) ---
                         odds_data = competitions.get('odds', [])
                         bookie_home_odds = 0
                         bookie_away_odds = 0
+                        odds_source = 'espn'
                         spread = None
                         drop_info = None
 
@@ -1251,6 +1314,7 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
                                 if ss_odds_data and ss_odds_data.get('home') and ss_odds_data.get('away'):
                                     bookie_home_odds = ss_odds_data['home']
                                     bookie_away_odds = ss_odds_data['away']
+                                    odds_source = 'sofascore'
                             except Exception as e:
                                 print(f"SS Odds Injection Error: {e}")
 
@@ -1300,6 +1364,17 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
 
                             except: pass
 
+                        # --- LOCAL ODDS TICKS (Baron tracking on our own price history) ---
+                        for side, price in (('home', bookie_home_odds), ('away', bookie_away_odds)):
+                            if not isinstance(price, (int, float)) or price <= 1.0: continue
+                            odds_ticks.append((event['id'], odds_source, 'ML', side, price))
+                            mv = local_moves.get((str(event['id']), odds_source, side))
+                            if mv and mv['open'] > 0:
+                                drop_pct = ((mv['open'] - price) / mv['open']) * 100
+                                if drop_pct > 1.1 and drop_pct > (drop_info or {}).get('pct', 0):
+                                    drop_info = {'side': side, 'pct': round(drop_pct, 1),
+                                                 'open': mv['open'], 'curr': price, 'type': 'LOCAL_TICKS'}
+
                         # --- BLEND HISTORY WITH MARKET REALITY ---
                         # If market odds exist, use them to correct history
                         if bookie_home_odds > 1.0 and bookie_away_odds > 1.0:
@@ -1316,7 +1391,7 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
 
                         # --- PRO PREDICTION GENERATION ---
                         # Pass real stats to engine
-                        pro_stats = stat_engine.predict_match(
+                        pro_stats = engine.predict_match(
                             home_win_rate, away_win_rate, league["code"], sport,
                             home_team=home_team,
                             away_team=away_team,
@@ -1440,6 +1515,7 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
                             "home": home_team,
                                 "away": away_team,
                                 "time": display_time,
+                            "kickoff": match_date or None,
                             "status": "Live" if status_state == 'in' else "Completed" if status_state == 'post' else "Upcoming",
                             "score": f"{home_score}-{away_score}",
                             "odds": {"home": bookie_home_odds, "away": bookie_away_odds, "spread": spread},
@@ -1491,8 +1567,8 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
                         # 'league' field which matches baselines keys
 
                         # Note: 'league' variable holds the code e.g. 'eng.1'
-                        if str(league) in stat_engine.learned_weights:
-                            adj = stat_engine.learned_weights[str(league)].get(
+                        if str(league) in engine.learned_weights:
+                            adj = engine.learned_weights[str(league)].get(
                                 'confidence_modifier', 0)
                             if adj != 0:
                                 sys_confidence += adj
@@ -1501,249 +1577,15 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
                         match['recommendation'] = sys_rec
                         match['value_found'] = False
 
-                        # --- AI MODEL INTEGRATION (RANDOM FOREST) ---
-                        ai_conf_boost = 0
-                        ai_note_text = ""
-
-                        try:
-                            # Check if Model is Loaded
-                            if 'AI_MODEL' not in globals():
-                                global AI_MODEL, AI_ENCODER
-                                if os.path.exists("model.pkl"):
-                                    AI_MODEL = joblib.load("model.pkl")
-                                    AI_ENCODER = joblib.load("encoder.pkl")
-                                else:
-                                    AI_MODEL = None
-
-                            if AI_MODEL:
-                                # Prepare Features: [league_code, home_odds, away_odds, confidence]
-                                # Encode League
-                                try:
-                                    l_code = AI_ENCODER.transform(
-                                        [league["name"]])[0]
-                                except:
-                                    l_code = 0  # Unknown league (fallback)
-
-                                # Handle Odds safely
-                                h_o = float(bookie_home_odds) if isinstance(
-                                    bookie_home_odds, (int, float)) else 1.50
-                                a_o = float(bookie_away_odds) if isinstance(
-                                    bookie_away_odds, (int, float)) else 1.50
-
-                                features = pd.DataFrame([[l_code, h_o, a_o, sys_confidence]],
-                                                      columns=['league_code', 'home_odds', 'away_odds', 'confidence'])
-
-                                # Predict (Prob of Class 1: Win)
-                                ai_prob = AI_MODEL.predict_proba(features)[
-                                                                 0][1] * 100
-
-                                # AI Insight Logic
-                                if ai_prob > 75:
-                                    ai_conf_boost = 10
-                                    ai_note_text = f"YAPAY ZEKA ONAYLI (%{
-    int(ai_prob)} Güven). Random Forest modeli bu maçı 'Kazanır' olarak görüyor."
-                                elif ai_prob < 30:
-                                    ai_conf_boost = -15
-                                    ai_note_text = f"YAPAY ZEKA UYARISI (%{
-    int(ai_prob)}). Model bu maça güvenmiyor."
-
-                        except Exception as e:
-                            print(f"AI PREDICT ERROR: {e}")
-
-                        # Apply AI Boost
-                        sys_confidence += ai_conf_boost
-
-                        # --- HIGH CONFIDENCE FILTERING (The "90%" Target) ---
-                        # If confidence is below 65%, force PAS.
-                        # We use the SIMULATION CONFIDENCE calculated above
-
-                        # Fix scope issue: define sys_rec if not defined
-                        if 'sys_rec' not in locals():
-                             if home_prob > away_prob: sys_rec = "MS 1"
-                             else: sys_rec = "MS 2"
-
-                        if sys_confidence < 65 and not spread and not live_stats:
-                             match['recommendation'] = "PAS"
-                        if sys_confidence >= 85:
-                            match['value_found'] = True
-                            match['recommendation'] = f"💎 KASA: {sys_rec}"
-                            match['reasoning'] = f"🔮 KAHİN MAX GÜVEN: %{sys_confidence} | Mutlak İstatistiksel Hakimiyet"
-                        elif sys_confidence >= 75:
-                            match['value_found'] = True
-                            match['recommendation'] = f"🔥 BANKO: {sys_rec}"
-                            match['reasoning'] = f"🔮 KAHİN ONAYLI: %{sys_confidence} | Derin Form ve Momentum Analizi"
-                        elif sys_confidence >= 65:
-                            match['recommendation'] = sys_rec
-                            match['reasoning'] = f"Yapay Zeka Analiz: {sys_rec} (Güven: %{sys_confidence})"
-                        else:
-                             match['recommendation'] = "PAS"
-                             match['reasoning'] = "Yeterli veri güveni oluşmadı (%65 altı)."
-
-                        if ai_note_text:
-                            match['reasoning'] += f"\n\n🔮 KAHİN NOTU: {ai_note_text}"
-
-                        # --- WORLD CLASS ODDS ANALYSIS (KELLY CRITERION) ---
-                        # The "Gold Standard" in professional betting
-
-                        market_vig = 0.05  # Standard bookie margin 5%
-
-                        if isinstance(bookie_home_odds, (int, float)
-                                      ) and bookie_home_odds > 1.0:
-                             # 1. Vig-Free Probability (True Market Price) implied by bookie?
-                             # No, we trust OUR probability (sys_confidence).
-
-                             real_prob = sys_confidence / 100.0
-                             decimal_odds = bookie_home_odds
-
-                             # Kelly Formula: f = (bp - q) / b
-                             # b = odds - 1
-                             b = decimal_odds - 1
-                             p = real_prob
-                             q = 1 - p
-
-                             kelly_fraction = (b * p - q) / b
-
-                             # Professional Conservative Adjustment (Quarter Kelly)
-                             # Full Kelly is too volatile for mortals.
-                             # Percentage of Bankroll
-                             safe_stake = max(0, (kelly_fraction * 0.25) * 100)
-
-                             edge = (real_prob - (1 / decimal_odds)) * 100
-
-                             if safe_stake > 0 and edge > 0:
-                                  match['value_found'] = True
-
-                                  # Tiered Advice based on Stake Size
-                                  stake_advice = "DÜŞÜK"
-                                  if safe_stake > 4.0:
-                                      stake_advice = "MAX (KASA)"
-                                  elif safe_stake > 2.5: stake_advice = "YÜKSEK"
-                                  elif safe_stake > 1.0: stake_advice = "ORTA"
-
-                                  match['recommendation'] = f"{sys_rec} [STAKE %{
-    safe_stake:.1f}]"
-                                  if "KASA" in stake_advice:
-                                       match['recommendation'] = f"💎 KASA: {
-    match['recommendation']}"
-                                  elif "YÜKSEK" in stake_advice:
-                                       match['recommendation'] = f"🔥 BANKO: {
-    match['recommendation']}"
-
-                                  match['reasoning'] = (
-                                      f"🔮 KAHİN MATEMATİKSEL ANALİZ (Kelly): Kasanın %{
-    safe_stake:.2f}'si Basılmalı.\n"
-                                      f"📊 Matematiksel Avantaj (Edge): +%{
-    edge:.1f}\n"
-                                      f"🎯 Kahin Hedefi: {
-    round(
-        1 / real_prob,
-         2)} | Piyasa Oranı: {decimal_odds} | Tahmin Gücü: {stake_advice}"
-                                  )
-
-
-                             elif edge < -10:
-                                   match['reasoning'] += f" | 📉 NEGATİF DEĞER: Bu orandan oynanmaz. Matematiksel kayıp."
-                        
-                        # BARON ALERT (Dropping Odds Override)
-                        if match.get('dropping_odds'):
-                             d = match['dropping_odds']
-                             side_tr = "EV SAHİBİ" if d['side'] == 'home' else "DEPLASMAN"
-                             match['value_found'] = True # Always highlight dropping odds
-                             match['recommendation'] = f"🔮 KAHİN SİNYALİ: {side_tr}"
-                             match['reasoning'] = f"⚠️ KAHİN PAZAR ANALİZİ: BARON OPERASYONU TESPİT EDİLDİ!\nOran açılıştan bu yana sert düştü.\nAçılış: {d['open']} -> Güncel: {d['curr']} (Düşüş: %{d['pct']})"
-                        
-                        # --- RESULT VERIFICATION ---
-                        match['result'] = 'pending'
-                        if status_state == 'post':
-                            try:
-                                h = int(home_score)
-                                a = int(away_score)
-                                
-                                # ONLY Verify if it was a recommended Value Bet
-                                if match.get('value_found', False):
-                                    rec = match.get('recommendation', '')
-                                    
-                                    if "MS 1" in rec: match['result'] = 'won' if h > a else 'lost'
-                                    elif "MS 2" in rec: match['result'] = 'won' if a > h else 'lost'
-                                    elif "MS X" in rec: match['result'] = 'won' if h == a else 'lost'
-                                else:
-                                    match['result'] = 'skipped' 
-                                
-                                pick = pro_stats.get('best_goal_pick', '')
-                                
-                                pick = pro_stats.get('best_goal_pick', '')
-                                passed = False
-                                
-                                # Soccer
-                                if "2.5 ÜST" in pick and (h+a) > 2.5: passed = True
-                                if "2.5 ALT" in pick and (h+a) < 2.5: passed = True
-                                if "1.5 ÜST" in pick and (h+a) > 1.5: passed = True
-                                if "3.5 ALT" in pick and (h+a) < 3.5: passed = True
-                                
-                                # Basketball
-                                if "(B)" in pick or "EV -" in pick or "DEP -" in pick:
-                                    try:
-                                        parts = pick.split(' ')
-                                        if len(parts) >= 2 and parts[0].replace('.','',1).isdigit():
-                                            val = float(parts[0])
-                                            if "ÜST" in pick and (h+a) > val: passed = True
-                                            if "ALT" in pick and (h+a) < val: passed = True
-                                        
-                                        if "EV -" in pick: 
-                                            margin = float(pick.split('-')[1].split(' ')[0])
-                                            if (h - a) > margin: passed = True
-                                        if "DEP -" in pick:
-                                            margin = float(pick.split('-')[1].split(' ')[0])
-                                            if (a - h) > margin: passed = True
-                                    except: pass
-                                    
-                                match['goal_pick_result'] = 'won' if passed else 'lost'
-                                
-                                prop = pro_stats.get('best_props_pick', '')
-                                prop_passed = False
-                                
-                                if "KORNER" in prop:
-                                    try:
-                                        line = float(prop.split(' ')[0])
-                                        total_c = live_stats.get('home_corners', 0) + live_stats.get('away_corners', 0)
-                                        if "ÜST" in prop and total_c > line: prop_passed = True
-                                        if "ALT" in prop and total_c < line: prop_passed = True
-                                    except: pass
-                                
-                                if "KART" in prop:
-                                    try:
-                                        line = float(prop.split(' ')[0])
-                                        total_cards = (live_stats.get('home_yc', 0) + live_stats.get('away_yc', 0))
-                                        if "ÜST" in prop and total_cards > line: prop_passed = True
-                                        if "ALT" in prop and total_cards < line: prop_passed = True
-                                    except: pass
-                                    
-                                match['props_pick_result'] = 'won' if prop_passed else 'lost'
-                                
-                            except: pass
-                        
-                        # --- FINAL SIMULATION APPEND ---
-                        # Ensure this is always visible at the bottom of the analysis
-                        sim_data = pro_stats.get('sim_details', {'home_win_prob': 0, 'away_win_prob': 0, 'draw_prob': 0, 'over_2_5_prob': 0, 'over_1_5_prob': 0})
-                        sim_text = (
-                            f"\n---------------\n"
-                            f"🔮 KAHİN DERİN SİMÜLASYON (10.000 Maç):\n"
-                            f"• Ev Sahibi: %{int(sim_data['home_win_prob'])}\n"
-                            f"• Deplasman: %{int(sim_data['away_win_prob'])}\n"
-                            f"• Beraberlik: %{int(sim_data['draw_prob'])}\n"
-                            f"• 1.5 Üst: %{int(sim_data.get('over_1_5_prob', 0))}\n"
-                            f"• 2.5 Üst: %{int(sim_data['over_2_5_prob'])}\n"
-                            f"• KG Var: %{int(sim_data.get('btts_prob', 0))}"
-                        )
-                        
-                        if 'reasoning' not in match: match['reasoning'] = ""
-                        match['reasoning'] += sim_text
-                        
-                        if match.get('ai_note'):
-                             match['reasoning'] += f"\n\n🔮 KAHİN AI: {match['ai_note']}"
-
-                        match['live_details'] = live_stats
-                        matches.append(match)
+                        # --- AI MODEL (RANDOM FOREST) ---
+                        # Scored for the whole cycle in one batch; everything that depends
+                        # on the final confidence runs in finalize_match() afterwards.
+                        pending.append((match, {
+                            'league': league["name"], 'home_odds': bookie_home_odds, 'away_odds': bookie_away_odds,
+                            'confidence': sys_confidence, 'sys_rec': sys_rec, 'spread': spread,
+                            'live_stats': live_stats, 'status_state': status_state,
+                            'home_score': home_score, 'away_score': away_score, 'pro_stats': pro_stats,
+                        }))
                         
                     except Exception as e:
                          print(f"MATCH ERROR for {home_team} vs {away_team}: {e} | Type: {type(e)}")
@@ -1755,49 +1597,254 @@ def fetch_matches_for_dates(dates_to_fetch, LEAGUES):
                 print(f"LEAGUE ERROR: {e}")
                 continue
 
+    # --- AI MODEL: one predict_proba for every fixture of the cycle ---
+    from model_server import model_server  # numpy (+ joblib on first load), ingest only
+    try:
+        ai_probs = model_server.predict_win_probs([state for _, state in pending])
+    except Exception as e:
+        print(f"AI PREDICT ERROR: {e}")
+        ai_probs = None
+    for i, (match, state) in enumerate(pending):
+        try:
+            finalize_match(match, state, ai_probs[i] if ai_probs else None)
+            matches.append(match)
+        except Exception as e:
+            print(f"MATCH ERROR for {match['home']} vs {match['away']}: {e} | Type: {type(e)}")
+            import traceback
+            traceback.print_exc()
+
+    # --- ODDS HISTORY: one bulk write per cycle (unchanged prices are skipped) ---
+    try:
+        db_manager.record_odds_ticks(odds_ticks)
+    except Exception as e:
+        print(f"Odds Tick Save Error: {e}")
+
+    # --- H2H FALLBACK IDS: shared with the web process ---
+    try:
+        save_team_ids()
+    except Exception as e:
+        print(f"Team ID Save Error: {e}")
+
     # --- AUTO-LEARNING: Save to Training Data ---
     save_training_data(matches)
 
     return matches
 
-def save_training_data(matches):
-    import csv
-    import os
-    
-    filename = "training_data.csv"
-    headers = ["date", "league", "home", "away", "home_odds", "away_odds", "prediction", "confidence", "result", "h_score", "a_score"]
+def finalize_match(match, state, ai_prob=None):
+    """
+    Applies the AI score (win probability 0-100, None without a model) and the
+    confidence-dependent steps: recommendation tiers, Kelly stake, dropping-odds
+    override, result verification and the simulation summary.
+    """
+    sys_confidence = state['confidence']
+    sys_rec = state['sys_rec']
+    spread = state['spread']
+    live_stats = state['live_stats']
+    status_state = state['status_state']
+    home_score, away_score = state['home_score'], state['away_score']
+    pro_stats = state['pro_stats']
+    bookie_home_odds = state['home_odds']
+
+    # AI Insight Logic
+    ai_conf_boost = 0
+    ai_note_text = ""
+    if ai_prob is not None:
+        if ai_prob > 75:
+            ai_conf_boost = 10
+            ai_note_text = f"YAPAY ZEKA ONAYLI (%{int(ai_prob)} Güven). Random Forest modeli bu maçı 'Kazanır' olarak görüyor."
+        elif ai_prob < 30:
+            ai_conf_boost = -15
+            ai_note_text = f"YAPAY ZEKA UYARISI (%{int(ai_prob)}). Model bu maça güvenmiyor."
+
+    # Apply AI Boost
+    sys_confidence += ai_conf_boost
+
+    # --- HIGH CONFIDENCE FILTERING (The "90%" Target) ---
+    # If confidence is below 65%, force PAS.
+    # We use the SIMULATION CONFIDENCE calculated above
+
+    if sys_confidence < 65 and not spread and not live_stats:
+         match['recommendation'] = "PAS"
+    if sys_confidence >= 85:
+        match['value_found'] = True
+        match['recommendation'] = f"💎 KASA: {sys_rec}"
+        match['reasoning'] = f"🔮 KAHİN MAX GÜVEN: %{sys_confidence} | Mutlak İstatistiksel Hakimiyet"
+    elif sys_confidence >= 75:
+        match['value_found'] = True
+        match['recommendation'] = f"🔥 BANKO: {sys_rec}"
+        match['reasoning'] = f"🔮 KAHİN ONAYLI: %{sys_confidence} | Derin Form ve Momentum Analizi"
+    elif sys_confidence >= 65:
+        match['recommendation'] = sys_rec
+        match['reasoning'] = f"Yapay Zeka Analiz: {sys_rec} (Güven: %{sys_confidence})"
+    else:
+         match['recommendation'] = "PAS"
+         match['reasoning'] = "Yeterli veri güveni oluşmadı (%65 altı)."
+
+    if ai_note_text:
+        match['reasoning'] += f"\n\n🔮 KAHİN NOTU: {ai_note_text}"
+
+    # --- WORLD CLASS ODDS ANALYSIS (KELLY CRITERION) ---
+    # The "Gold Standard" in professional betting
+
+    market_vig = 0.05  # Standard bookie margin 5%
+
+    if isinstance(bookie_home_odds, (int, float)
+                  ) and bookie_home_odds > 1.0:
+         # 1. Vig-Free Probability (True Market Price) implied by bookie?
+         # No, we trust OUR probability (sys_confidence).
+
+         real_prob = sys_confidence / 100.0
+         decimal_odds = bookie_home_odds
+
+         # Kelly Formula: f = (bp - q) / b
+         # b = odds - 1
+         b = decimal_odds - 1
+         p = real_prob
+         q = 1 - p
+
+         kelly_fraction = (b * p - q) / b
+
+         # Professional Conservative Adjustment (Quarter Kelly)
+         # Full Kelly is too volatile for mortals.
+         # Percentage of Bankroll
+         safe_stake = max(0, (kelly_fraction * 0.25) * 100)
+
+         edge = (real_prob - (1 / decimal_odds)) * 100
+
+         if safe_stake > 0 and edge > 0:
+              match['value_found'] = True
+
+              # Tiered Advice based on Stake Size
+              stake_advice = "DÜŞÜK"
+              if safe_stake > 4.0:
+                  stake_advice = "MAX (KASA)"
+              elif safe_stake > 2.5: stake_advice = "YÜKSEK"
+              elif safe_stake > 1.0: stake_advice = "ORTA"
+
+              match['recommendation'] = f"{sys_rec} [STAKE %{safe_stake:.1f}]"
+              if "KASA" in stake_advice:
+                   match['recommendation'] = f"💎 KASA: {match['recommendation']}"
+              elif "YÜKSEK" in stake_advice:
+                   match['recommendation'] = f"🔥 BANKO: {match['recommendation']}"
+
+              match['reasoning'] = (
+                  f"🔮 KAHİN MATEMATİKSEL ANALİZ (Kelly): Kasanın %{safe_stake:.2f}'si Basılmalı.\n"
+                  f"📊 Matematiksel Avantaj (Edge): +%{edge:.1f}\n"
+                  f"🎯 Kahin Hedefi: {round(1 / real_prob, 2)} | Piyasa Oranı: {decimal_odds} | Tahmin Gücü: {stake_advice}"
+              )
+
+
+         elif edge < -10:
+               match['reasoning'] += f" | 📉 NEGATİF DEĞER: Bu orandan oynanmaz. Matematiksel kayıp."
     
-    file_exists = os.path.isfile(filename)
+    # BARON ALERT (Dropping Odds Override)
+    if match.get('dropping_odds'):
+         d = match['dropping_odds']
+         side_tr = "EV SAHİBİ" if d['side'] == 'home' else "DEPLASMAN"
+         match['value_found'] = True # Always highlight dropping odds
+         match['recommendation'] = f"🔮 KAHİN SİNYALİ: {side_tr}"
+         match['reasoning'] = f"⚠️ KAHİN PAZAR ANALİZİ: BARON OPERASYONU TESPİT EDİLDİ!\nOran açılıştan bu yana sert düştü.\nAçılış: {d['open']} -> Güncel: {d['curr']} (Düşüş: %{d['pct']})"
     
-    try:
-        with open(filename, mode='a', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=headers)
-            if not file_exists: writer.writeheader()
+    # --- RESULT VERIFICATION ---
+    match['result'] = 'pending'
+    if status_state == 'post':
+        try:
+            h = int(home_score)
+            a = int(away_score)
+            
+            # ONLY Verify if it was a recommended Value Bet
+            if match.get('value_found', False):
+                rec = match.get('recommendation', '')
+                
+                if "MS 1" in rec: match['result'] = 'won' if h > a else 'lost'
+                elif "MS 2" in rec: match['result'] = 'won' if a > h else 'lost'
+                elif "MS X" in rec: match['result'] = 'won' if h == a else 'lost'
+            else:
+                match['result'] = 'skipped' 
+            
+            pick = pro_stats.get('best_goal_pick', '')
             
-            for m in matches:
-                # Only save COMPLETED matches with a RESULT
-                if m.get('status') == 'Completed' and m.get('result') in ['won', 'lost']:
+            pick = pro_stats.get('best_goal_pick', '')
+            passed = False
+            
+            # Soccer
+            if "2.5 ÜST" in pick and (h+a) > 2.5: passed = True
+            if "2.5 ALT" in pick and (h+a) < 2.5: passed = True
+            if "1.5 ÜST" in pick and (h+a) > 1.5: passed = True
+            if "3.5 ALT" in pick and (h+a) < 3.5: passed = True
+            
+            # Basketball
+            if "(B)" in pick or "EV -" in pick or "DEP -" in pick:
+                try:
+                    parts = pick.split(' ')
+                    if len(parts) >= 2 and parts[0].replace('.','',1).isdigit():
+                        val = float(parts[0])
+                        if "ÜST" in pick and (h+a) > val: passed = True
+                        if "ALT" in pick and (h+a) < val: passed = True
                     
-                    # Extract confidence from reasoning text if possible
-                    conf = 0
-                    try:
-                        if "%" in m.get('reasoning', ''):
-                            conf = int(m['reasoning'].split('%')[1].split(' ')[0])
-                    except: pass
+                    if "EV -" in pick: 
+                        margin = float(pick.split('-')[1].split(' ')[0])
+                        if (h - a) > margin: passed = True
+                    if "DEP -" in pick:
+                        margin = float(pick.split('-')[1].split(' ')[0])
+                        if (a - h) > margin: passed = True
+                except: pass
+                
+            match['goal_pick_result'] = 'won' if passed else 'lost'
+            
+            prop = pro_stats.get('best_props_pick', '')
+            prop_passed = False
+            
+            if "KORNER" in prop:
+                try:
+                    line = float(prop.split(' ')[0])
+                    total_c = live_stats.get('home_corners', 0) + live_stats.get('away_corners', 0)
+                    if "ÜST" in prop and total_c > line: prop_passed = True
+                    if "ALT" in prop and total_c < line: prop_passed = True
+                except: pass
+            
+            if "KART" in prop:
+                try:
+                    line = float(prop.split(' ')[0])
+                    total_cards = (live_stats.get('home_yc', 0) + live_stats.get('away_yc', 0))
+                    if "ÜST" in prop and total_cards > line: prop_passed = True
+                    if "ALT" in prop and total_cards < line: prop_passed = True
+                except: pass
+                
+            match['props_pick_result'] = 'won' if prop_passed else 'lost'
+            
+        except: pass
+    
+    # --- FINAL SIMULATION APPEND ---
+    # Ensure this is always visible at the bottom of the analysis
+    sim_data = pro_stats.get('sim_details', {'home_win_prob': 0, 'away_win_prob': 0, 'draw_prob': 0, 'over_2_5_prob': 0, 'over_1_5_prob': 0})
+    sim_text = (
+        f"\n---------------\n"
+        f"🔮 KAHİN DERİN SİMÜLASYON (10.000 Maç):\n"
+        f"• Ev Sahibi: %{int(sim_data['home_win_prob'])}\n"
+        f"• Deplasman: %{int(sim_data['away_win_prob'])}\n"
+        f"• Beraberlik: %{int(sim_data['draw_prob'])}\n"
+        f"• 1.5 Üst: %{int(sim_data.get('over_1_5_prob', 0))}\n"
+        f"• 2.5 Üst: %{int(sim_data['over_2_5_prob'])}\n"
+        f"• KG Var: %{int(sim_data.get('btts_prob', 0))}"
+    )
+    
+    if 'reasoning' not in match: match['reasoning'] = ""
+    match['reasoning'] += sim_text
+    
+    if match.get('ai_note'):
+         match['reasoning'] += f"\n\n🔮 KAHİN AI: {match['ai_note']}"
+
+    match['live_details'] = live_stats
+    return match
 
-                    writer.writerow({
-                        "date": m['time'],
-                        "league": m['league'],
-                        "home": m['home'],
-                        "away": m['away'],
-                        "home_odds": m['odds']['home'],
-                        "away_odds": m['odds']['away'],
-                        "prediction": m['recommendation'],
-                        "confidence": conf,
-                        "result": m['result'],
-                        "h_score": m['score'].split('-')[0] if '-' in m['score'] else 0,
-                        "a_score": m['score'].split('-')[1] if '-' in m['score'] else 0
-                    })
+def save_training_data(matches):
+    """Upserts completed won/lost matches into the training store (one row per match id)."""
+    try:
+        from training_store import get_training_store
+        changed = get_training_store().save_matches(matches)
+        if changed:
+            print(f"🧠 Eğitim verisi: {changed} yeni/güncellenmiş örnek")
     except Exception as e:
         print(f"TRAINING SAVE ERROR: {e}")
 
@@ -1806,7 +1853,7 @@ if __name__ == "__main__":
     print("Fetching History for training...")
     hist = scrape_history()
     save_training_data(hist)
-    print(f"Saved {len(hist)} historical matches to training_data.csv")
+    print(f"Saved {len(hist)} historical matches to the training store")
     
     data = scrape_todays_fixtures()
     print(f"Stats Engine Verified. Matches Found: {len(data)}")
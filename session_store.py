@@ -0,0 +1,157 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Chat follow-up context ("peki", "sadece") per client sessionId.
+# KAHIN_SESSION_STORE=sqlite shares it across worker processes; default is in-process.
+SESSION_STORE = os.environ.get("KAHIN_SESSION_STORE", "memory")
+# Own file: kahin_data.db is held in long write transactions by the ingest process
+SESSION_DB_PATH = os.environ.get("KAHIN_SESSION_DB", "kahin_sessions.db")
+SESSION_TTL = 30 * 60
+MAX_SESSIONS = 10000
+# Client-supplied ids longer than this are cut (they are only a lookup key)
+MAX_SESSION_ID_LENGTH = 128
+
+
+class MemorySessionStore:
+    """Bounded LRU + TTL dict; least recently used sessions are evicted first."""
+
+    def __init__(self, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._data = OrderedDict()  # session_id -> (value, expires_at)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, session_id):
+        now = time.time()
+        with self._lock:
+            item = self._data.get(session_id)
+            if item is None:
+                self.stats['misses'] += 1
+                return None
+            if item[1] <= now:
+                del self._data[session_id]
+                self.stats['expirations'] += 1
+                self.stats['misses'] += 1
+                return None
+            self._data.move_to_end(session_id)
+            self.stats['hits'] += 1
+            return item[0]
+
+    def set(self, session_id, value):
+        with self._lock:
+            self._data[session_id] = (value, time.time() + self.ttl)
+            self._data.move_to_end(session_id)
+            while len(self._data) > self.max_sessions:
+                self._data.popitem(last=False)
+                self.stats['evictions'] += 1
+
+    def __len__(self):
+        return len(self._data)
+
+    def info(self):
+        return dict(self.stats, size=len(self._data), max_sessions=self.max_sessions, backend='memory')
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in the chat_sessions table of their own SQLite file (SESSION_DB_PATH),
+    so every worker process sees the same context without contending with ingest
+    writes on kahin_data.db. Expired rows are purged, and the table trimmed to
+    max_sessions, every PURGE_EVERY writes. If the file is locked or unusable, the
+    request falls back to an in-process MemorySessionStore instead of failing.
+    """
+    PURGE_EVERY = 200
+
+    def __init__(self, db_path=SESSION_DB_PATH, max_sessions=MAX_SESSIONS, ttl=SESSION_TTL):
+        from db_manager import ConnectionManager
+        self.connections = ConnectionManager(db_path)
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.fallback = MemorySessionStore(max_sessions, ttl)
+        self._writes = 0
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'fallbacks': 0}
+        with self.connections.writer() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    data TEXT,
+                    updated_at REAL
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_chat_sessions_updated ON chat_sessions (updated_at)")
+
+    def _fell_back(self, e):
+        with self._lock:
+            self.stats['fallbacks'] += 1
+        print(f"⚠️ Oturum veritabanı kullanılamadı, bellek içi depoya geçildi: {e}")
+
+    def get(self, session_id):
+        try:
+            row = self.connections.reader().execute(
+                "SELECT data FROM chat_sessions WHERE session_id=? AND updated_at > ?",
+                (session_id, time.time() - self.ttl)).fetchone()
+        except sqlite3.OperationalError as e:
+            self._fell_back(e)
+            return self.fallback.get(session_id)
+        if row is None and len(self.fallback):
+            return self.fallback.get(session_id)  # written while the file was locked
+        with self._lock:
+            self.stats['hits' if row else 'misses'] += 1
+        return json.loads(row[0]) if row else None
+
+    def set(self, session_id, value):
+        try:
+            with self.connections.writer() as conn:
+                conn.execute("""
+                    INSERT INTO chat_sessions (session_id, data, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT(session_id) DO UPDATE SET data=excluded.data, updated_at=excluded.updated_at
+                """, (session_id, json.dumps(value, ensure_ascii=False), time.time()))
+        except sqlite3.OperationalError as e:
+            self._fell_back(e)
+            self.fallback.set(session_id, value)
+            return
+        with self._lock:
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            try:
+                self.purge()
+            except sqlite3.OperationalError as e:
+                self._fell_back(e)
+
+    def purge(self):
+        with self.connections.writer() as conn:
+            expired = conn.execute("DELETE FROM chat_sessions WHERE updated_at <= ?",
+                                   (time.time() - self.ttl,)).rowcount
+            evicted = conn.execute("""
+                DELETE FROM chat_sessions WHERE session_id IN (
+                    SELECT session_id FROM chat_sessions ORDER BY updated_at DESC LIMIT -1 OFFSET ?)
+            """, (self.max_sessions,)).rowcount
+        with self._lock:
+            self.stats['expirations'] += expired
+            self.stats['evictions'] += evicted
+
+    def __len__(self):
+        return self.connections.reader().execute("SELECT COUNT(*) FROM chat_sessions").fetchone()[0]
+
+    def info(self):
+        try:
+            size = len(self)
+        except sqlite3.OperationalError:
+            size = None
+        return dict(self.stats, size=size, fallback_size=len(self.fallback),
+                    max_sessions=self.max_sessions, backend='sqlite')
+
+
+def create_session_store(kind=None):
+    """Session store selected by KAHIN_SESSION_STORE (memory | sqlite)."""
+    kind = kind or SESSION_STORE
+    if kind == 'sqlite':
+        return SQLiteSessionStore()
+    return MemorySessionStore()
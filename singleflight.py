@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+
+# Seconds a failed load (exception or None) is remembered before the upstream is tried again
+FAILURE_TTL = 30
+MAX_ENTRIES = 512
+
+
+class _Flight:
+    """One in-flight load shared by every caller of the same key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+
+
+class SingleFlightCache:
+    """
+    TTL cache in front of a slow upstream loader.
+    - Concurrent misses for the same key share one loader call (single flight).
+    - Entries older than ttl but younger than ttl + stale_ttl are served immediately
+      while one background refresh runs (stale-while-revalidate).
+    - A loader returning None or raising counts as a failure: the previous value is
+      kept, and keys without a value are not retried for FAILURE_TTL seconds.
+    """
+
+    def __init__(self, loader, ttl, stale_ttl=0, name="cache", max_entries=MAX_ENTRIES):
+        self.loader = loader
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.name = name
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (value, fetched_at)
+        self._failures = OrderedDict() # key -> failed_at, oldest first (bounded like _entries)
+        self._flights = {}             # key -> _Flight
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'stale': 0, 'misses': 0, 'coalesced': 0, 'failures': 0}
+
+    def get(self, *key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = now - entry[1]
+                if age < self.ttl:
+                    self.stats['hits'] += 1
+                    self._entries.move_to_end(key)
+                    return entry[0]
+                if age < self.ttl + self.stale_ttl:
+                    self.stats['stale'] += 1
+                    if key not in self._flights:
+                        flight = self._flights[key] = _Flight()
+                        threading.Thread(target=self._load, args=(key, flight), daemon=True).start()
+                    return entry[0]
+            elif now - self._failures.get(key, 0) < FAILURE_TTL:
+                return None
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+                self.stats['misses'] += 1
+            else:
+                self.stats['coalesced'] += 1
+
+        if leader:
+            self._load(key, flight)
+        else:
+            flight.done.wait()
+        if flight.value is None and entry is not None:
+            return entry[0]  # upstream failed: expired value beats nothing
+        return flight.value
+
+    def _load(self, key, flight):
+        value = None
+        try:
+            value = self.loader(*key)
+        except Exception as e:
+            print(f"⚠️ {self.name} yüklenemedi {key}: {e}")
+        with self._lock:
+            if value is None:
+                self.stats['failures'] += 1
+                self._record_failure(key, time.time())
+            else:
+                self._entries[key] = (value, time.time())
+                self._entries.move_to_end(key)
+                self._failures.pop(key, None)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            del self._flights[key]
+        flight.value = value
+        flight.done.set()
+
+    def _record_failure(self, key, now):
+        """Remembers a failed key; expired and surplus failures are dropped (caller holds the lock)."""
+        self._failures.pop(key, None)
+        self._failures[key] = now
+        while self._failures:
+            oldest_key, failed_at = next(iter(self._failures.items()))
+            if now - failed_at < FAILURE_TTL and len(self._failures) <= self.max_entries:
+                break
+            del self._failures[oldest_key]
+
+    def invalidate(self, *key):
+        with self._lock:
+            if key:
+                self._entries.pop(key, None)
+                self._failures.pop(key, None)
+            else:
+                self._entries.clear()
+                self._failures.clear()
@@ -0,0 +1,229 @@
+import gzip
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from match_snapshot import replay_deltas
+from response_cache import CachedBody, MIN_COMPRESS_SIZE
+
+# Multi-worker serving: ingestion writes every snapshot version to one immutable
+# file, web workers mmap it and serve byte ranges (no DB, no per-worker rebuild).
+# Routes that need Python objects (dashboard, SSE, chat, optimizer) decode the
+# bodies they use once per file and worker. Enable with KAHIN_SHARED_SNAPSHOT=1
+# (gunicorn.conf.py sets it).
+SHARED_SNAPSHOT = os.environ.get("KAHIN_SHARED_SNAPSHOT", "0") == "1"
+SNAPSHOT_DIR = os.environ.get("KAHIN_SNAPSHOT_DIR", "snapshots")
+POINTER_FILE = "CURRENT"
+MAGIC = b"KSNAP1\n"
+# Old generations kept on disk for workers still mapping them
+KEEP_FILES = 3
+# Seconds between two pointer checks in a worker
+POINTER_CHECK_INTERVAL = 1.0
+
+SPORTS = (None, 'soccer', 'basketball')
+# Bodies only decoded by the workers (never sent as is), so stored without gzip
+INTERNAL_BODIES = ('matches', 'deltas')
+
+
+def snapshot_bodies(snap, deltas=()):
+    """{key: payload} of every view served from the shared file."""
+    bodies = {}
+    for sport in SPORTS:
+        bodies[f"fixtures:{sport or ''}"] = snap.fixtures(sport)
+        bodies[f"history:{sport or ''}"] = snap.history_for(sport)
+    bodies["coupons"] = snap.coupons
+    # Chat index source and the SSE delta log of the ingest process
+    bodies["matches"] = snap.matches
+    bodies["deltas"] = list(deltas)
+    return bodies
+
+
+def write_snapshot_file(snap, directory=SNAPSHOT_DIR, deltas=()):
+    """
+    Writes snap as <directory>/snap-<version>.bin and repoints CURRENT to it.
+    `deltas` is SnapshotCache.delta_log(), replayed to reconnecting /api/stream clients.
+    Layout: MAGIC, u32 header length, JSON header {version, generation, index}, bodies.
+    Both renames are atomic, so readers only ever see complete files.
+    Returns the file name, or None when this version is already current.
+    """
+    os.makedirs(directory, exist_ok=True)
+    name = f"snap-{snap.version}.bin"
+    if read_pointer(directory) == name:
+        return None
+
+    index, blobs, offset = {}, [], 0
+    for key, payload in snapshot_bodies(snap, deltas).items():
+        identity = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        entry = {'etag': f'"g{snap.version}-{hashlib.sha1(identity).hexdigest()[:12]}"'}
+        parts = [('identity', identity)]
+        if len(identity) >= MIN_COMPRESS_SIZE and key not in INTERNAL_BODIES:
+            parts.append(('gzip', gzip.compress(identity, 6)))
+        for part, data in parts:
+            entry[part] = [offset, len(data)]
+            blobs.append(data)
+            offset += len(data)
+        index[key] = entry
+
+    header = json.dumps({'version': snap.version, 'generation': snap.generation, 'index': index}).encode('utf-8')
+    base = len(MAGIC) + 4 + len(header)
+    tmp_path = os.path.join(directory, name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for data in blobs:
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(directory, name))
+
+    pointer_tmp = os.path.join(directory, POINTER_FILE + ".tmp")
+    with open(pointer_tmp, "w", encoding="utf-8") as f:
+        f.write(f"{name}\n{base}\n")
+    os.replace(pointer_tmp, os.path.join(directory, POINTER_FILE))
+
+    _prune(directory, name)
+    return name
+
+
+def _prune(directory, current):
+    files = sorted((f for f in os.listdir(directory) if f.startswith("snap-") and f.endswith(".bin") and f != current),
+                   key=lambda f: os.path.getmtime(os.path.join(directory, f)), reverse=True)
+    for f in files[KEEP_FILES - 1:]:
+        try:
+            os.remove(os.path.join(directory, f))
+        except OSError:
+            pass  # Windows: still mapped by a worker, next cycle retries
+
+
+def read_pointer(directory=SNAPSHOT_DIR):
+    try:
+        with open(os.path.join(directory, POINTER_FILE), encoding="utf-8") as f:
+            return f.readline().strip() or None
+    except OSError:
+        return None
+
+
+class MappedSnapshot:
+    """
+    One mmapped snapshot file; bodies are zero-copy views into the mapping.
+    Also stands in for a MatchSnapshot (version, generation, active, matches, by_id):
+    those views are decoded from the file on first use and kept with the mapping.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path}: not a snapshot file")
+        (header_len,) = struct.unpack_from("<I", self._mm, len(MAGIC))
+        base = len(MAGIC) + 4
+        header = json.loads(self._mm[base:base + header_len])
+        self.version = header['version']
+        self.generation = header['generation']
+        view = memoryview(self._mm)[base + header_len:]
+        self.bodies = {}
+        for key, entry in header['index'].items():
+            off, length = entry['identity']
+            variants = {}
+            if 'gzip' in entry:
+                g_off, g_len = entry['gzip']
+                variants['gzip'] = view[g_off:g_off + g_len]
+            self.bodies[key] = CachedBody.from_parts(view[off:off + length], variants, entry['etag'])
+        self._decoded = {}
+        self._decode_lock = threading.Lock()
+
+    def body(self, key):
+        return self.bodies.get(key)
+
+    def payload(self, key, default=None):
+        """Decoded JSON of a body, parsed once per mapping; treat it as read-only."""
+        if key in self._decoded:
+            return self._decoded[key]
+        with self._decode_lock:
+            if key not in self._decoded:
+                body = self.bodies.get(key)
+                self._decoded[key] = json.loads(bytes(body.identity)) if body is not None else default
+            return self._decoded[key]
+
+    @property
+    def active(self):
+        return self.payload("fixtures:", [])
+
+    @property
+    def matches(self):
+        return self.payload("matches", [])
+
+    @property
+    def by_id(self):
+        by_id = self._decoded.get("by_id")
+        if by_id is None:
+            by_id = {m.get('id'): m for m in self.matches}
+            with self._decode_lock:
+                by_id = self._decoded.setdefault("by_id", by_id)
+        return by_id
+
+    def deltas_since(self, generation):
+        """SnapshotCache.deltas_since against the delta log written with this file."""
+        return replay_deltas(self.payload("deltas", []), generation, self.generation)
+
+
+class SharedSnapshotReader:
+    """
+    Per-worker handle on the current shared snapshot. Re-reads the pointer at most
+    once per POINTER_CHECK_INTERVAL and swaps to the new mapping when it moved;
+    the previous mapping is released once no request uses it anymore.
+    """
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        self.directory = directory
+        self._current = None
+        self._name = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.swaps = 0
+
+    def get(self):
+        now = time.monotonic()
+        if now - self._checked_at < POINTER_CHECK_INTERVAL:
+            return self._current
+        with self._lock:
+            self._checked_at = time.monotonic()
+            name = read_pointer(self.directory)
+            if name and name != self._name:
+                try:
+                    self._current = MappedSnapshot(os.path.join(self.directory, name))
+                    self._name = name
+                    self.swaps += 1
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Paylaşılan snapshot açılamadı ({name}): {e}")
+            return self._current
+
+    def body(self, key):
+        snap = self.get()
+        return snap.body(key) if snap is not None else None
+
+
+class SharedSnapshotSource:
+    """
+    SnapshotCache stand-in for web workers (get / deltas_since): the mapped shared
+    file, or the local cache until ingestion has published one.
+    """
+
+    def __init__(self, reader, fallback):
+        self.reader = reader
+        self.fallback = fallback
+
+    def get(self):
+        snap = self.reader.get()
+        return snap if snap is not None else self.fallback.get()
+
+    def deltas_since(self, generation):
+        snap = self.reader.get()
+        return snap.deltas_since(generation) if snap is not None else self.fallback.deltas_since(generation)
+
+
+shared_snapshot = SharedSnapshotReader()
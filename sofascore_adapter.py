@@ -2,7 +2,6 @@ import json
 import os
 import requests
 import re
-import cloudscraper
 from datetime import datetime
 
 class SofaScoreAdapter:
@@ -10,15 +9,23 @@ class SofaScoreAdapter:
         self.cache_file = cache_file
         self.data_map = {}
         self.team_ids = {} # Cache for team names -> IDs
-        self.scraper = cloudscraper.create_scraper(
-            browser={
-                'browser': 'chrome',
-                'platform': 'windows',
-                'desktop': True
-            }
-        )
+        self._scraper = None
         self.load_cache()
 
+    @property
+    def scraper(self):
+        """cloudscraper session, created on the first request (cloudscraper is slow to import)."""
+        if self._scraper is None:
+            import cloudscraper
+            self._scraper = cloudscraper.create_scraper(
+                browser={
+                    'browser': 'chrome',
+                    'platform': 'windows',
+                    'desktop': True
+                }
+            )
+        return self._scraper
+
     def load_cache(self):
         if os.path.exists(self.cache_file):
             try:
@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+from text_utils import slugify
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Static export for the CDN/Vercel deployment:
+#   export/<kind>/<sport>/<league-slug>/<YYYY-MM-DD>.json (+ .json.gz, .json.br)
+#   export/manifest.json  -> every shard with its sha256, so clients fetch only what changed
+EXPORT_DIR = "export"
+MANIFEST_FILE = "manifest.json"
+UNKNOWN_DAY = "unknown"
+
+
+def match_day(m, year=None):
+    """Kickoff day (YYYY-MM-DD) of a match, UNKNOWN_DAY when the feed had no date."""
+    kickoff = m.get('kickoff') or ''
+    if len(kickoff) >= 10:
+        return kickoff[:10]
+    # Older rows only carry the display time "DD.MM HH:MM"
+    try:
+        day = datetime.strptime(str(m.get('time', ''))[:5], "%d.%m")
+    except ValueError:
+        return UNKNOWN_DAY
+    return f"{year or datetime.now().year}-{day.month:02d}-{day.day:02d}"
+
+
+def build_shards(kind, matches):
+    """{relative path: (meta, matches)} grouped by sport, league and day."""
+    shards = {}
+    for m in matches:
+        sport = m.get('sport') or 'other'
+        league = m.get('league') or ''
+        day = match_day(m)
+        path = f"{kind}/{slugify(sport)}/{slugify(league)}/{day}.json"
+        shard = shards.setdefault(path, ({'kind': kind, 'sport': sport, 'league': league, 'day': day}, []))
+        shard[1].append(m)
+    return shards
+
+
+def _write_atomic(path, data):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def load_manifest(directory=EXPORT_DIR):
+    try:
+        with open(os.path.join(directory, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def export_static(fixtures, history, generation=None, directory=EXPORT_DIR):
+    """
+    Writes compact, precompressed shards for fixtures and history plus the manifest.
+    Shards whose content hash is unchanged are not rewritten; shards that no longer
+    exist are deleted. Returns (written, unchanged, removed) shard counts.
+    """
+    previous = load_manifest(directory).get('shards', {})
+    shards = {}
+    shards.update(build_shards('fixtures', fixtures))
+    shards.update(build_shards('history', history))
+
+    entries = {}
+    written = unchanged = 0
+    for rel_path, (meta, matches) in sorted(shards.items()):
+        data = json.dumps(matches, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        entry = dict(meta, count=len(matches), sha256=digest, bytes=len(data))
+        full_path = os.path.join(directory, *rel_path.split('/'))
+
+        old = previous.get(rel_path)
+        if old and old.get('sha256') == digest and os.path.exists(full_path):
+            unchanged += 1
+            entries[rel_path] = dict(entry, encodings=old.get('encodings', []))
+            continue
+
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        _write_atomic(full_path, data)
+        encodings = ['gzip']
+        _write_atomic(full_path + ".gz", gzip.compress(data, 9, mtime=0))
+        if brotli is not None:
+            encodings.append('br')
+            _write_atomic(full_path + ".br", brotli.compress(data, quality=11))
+        entries[rel_path] = dict(entry, encodings=encodings)
+        written += 1
+
+    removed = 0
+    for rel_path in set(previous) - set(entries):
+        full_path = os.path.join(directory, *rel_path.split('/'))
+        for suffix in ('', '.gz', '.br'):
+            try:
+                os.remove(full_path + suffix)
+            except OSError:
+                pass
+        removed += 1
+
+    if not written and not removed and previous:
+        return written, unchanged, removed  # manifest unchanged too: keep its ETag stable
+
+    # Per-sport shard lists so a client can load a single sport
+    sports = {}
+    for rel_path, entry in entries.items():
+        sports.setdefault(entry['kind'], {}).setdefault(entry['sport'], []).append(rel_path)
+
+    manifest = {
+        'generated_at': datetime.now().isoformat(timespec='seconds'),
+        'generation': generation,
+        'shards': entries,
+        'index': sports,
+    }
+    os.makedirs(directory, exist_ok=True)
+    _write_atomic(os.path.join(directory, MANIFEST_FILE),
+                  json.dumps(manifest, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+    return written, unchanged, removed
+
+
+if __name__ == "__main__":
+    # python static_export.py -> rebuild export/ from kahin_data.db before committing a deploy
+    from match_snapshot import snapshot_cache
+    snap = snapshot_cache.get()
+    written, unchanged, removed = export_static(snap.active, snap.history, snap.generation)
+    print(f"📦 Statik export: {written} yeni/değişen, {unchanged} aynı, {removed} silinen parça ({EXPORT_DIR}/)")
@@ -0,0 +1,28 @@
+import re
+import unicodedata
+
+def normalize_name(name):
+    if not name: return ""
+    name = name.lower()
+    replacements = {
+        'ı': 'i', 'ü': 'u', 'ö': 'o', 'ş': 's', 'ç': 'c', 'ğ': 'g',
+        'İ': 'i', 'Ü': 'u', 'Ö': 'o', 'Ş': 's', 'Ç': 'c', 'Ğ': 'g'
+    }
+    for k, v in replacements.items():
+        name = name.replace(k, v)
+    return name.strip()
+
+
+def fold_search_text(text):
+    """normalize_name plus removal of the combining dot left by 'İ'.lower() (for the search index)."""
+    return normalize_name(text).replace('\u0307', '')
+
+
+def search_tokens(text):
+    return re.findall(r"\w+", fold_search_text(text))
+
+
+def slugify(text):
+    """ASCII, URL/file-name safe form of a league or team name ('Süper Lig' -> 'super-lig')."""
+    folded = unicodedata.normalize('NFKD', fold_search_text(text)).encode('ascii', 'ignore').decode('ascii')
+    return re.sub(r'[^a-z0-9]+', '-', folded).strip('-') or 'other'
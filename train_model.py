@@ -1,38 +1,103 @@
-import pandas as pd
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
-from sklearn.model_selection import train_test_split
+from sklearn.model_selection import train_test_split, TimeSeriesSplit
 from sklearn.preprocessing import LabelEncoder
-from sklearn.metrics import accuracy_score, classification_report
+from sklearn.metrics import accuracy_score, classification_report, log_loss
+from concurrent.futures import ProcessPoolExecutor
+import itertools
 import joblib
+import json
+import multiprocessing
 import os
+import sys
+import time
+from datetime import datetime
+from training_store import get_training_store
 
-DATA_FILE = "training_data.csv"
 MODEL_FILE = "model.pkl"
 ENCODER_FILE = "encoder.pkl"
+CHECKPOINT_FILE = "train_checkpoint.json"
+
+FEATURES = ['league_code', 'home_odds', 'away_odds', 'confidence']
+RANDOM_STATE = 42
+# Forest settings used until a --search picks others (kept in the checkpoint)
+DEFAULT_PARAMS = {'n_estimators': 100, 'max_depth': 10}
+
+# --- HYPERPARAMETER SEARCH ---
+# Time-ordered CV: fold k trains on the oldest samples and validates on the block
+# right after them, so no fold ever scores on matches older than its training data.
+CV_FOLDS = 5
+SEARCH_GRID = {
+    'n_estimators': [100, 200],  # stays below MAX_TREES so --incremental can still add trees
+    'max_depth': [5, 10, None],
+    'min_samples_leaf': [1, 5],
+}
+
+# --- INCREMENTAL TRAINING ---
+# Trees added per incremental update (warm start), and the forest size that
+# triggers a full retrain instead (keeps the model file and predict time bounded)
+TREES_PER_UPDATE = 10
+MAX_TREES = 300
+# Labelled rows needed before an update is worth it
+MIN_NEW_SAMPLES = 20
+
+def load_checkpoint():
+    try:
+        with open(CHECKPOINT_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_checkpoint(seq, rf, le, samples, params=None):
+    checkpoint = {
+        'params': params or DEFAULT_PARAMS,    # forest settings a full retrain reuses
+        'seq': int(seq),                       # training_samples.seq consumed (watermark)
+        'n_estimators': int(rf.n_estimators),
+        'leagues': [str(c) for c in le.classes_],
+        'samples': int(samples),               # labelled rows the forest has seen
+        'trained_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    with open(CHECKPOINT_FILE, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    return checkpoint
+
+def labelled(df):
+    """won/lost rows with a 0/1 target column."""
+    df = df[df['result'].isin(['won', 'lost'])].copy()
+    df['target'] = (df['result'] == 'won').astype(int)
+    return df
+
+def time_ordered(df):
+    """Samples oldest first: by kickoff, then store order (imported CSV rows have no kickoff)."""
+    return df.sort_values(['kickoff', 'seq'], kind='stable').reset_index(drop=True)
+
+def model_params():
+    """Forest settings of the last checkpoint (chosen by --search), else DEFAULT_PARAMS."""
+    checkpoint = load_checkpoint() or {}
+    return checkpoint.get('params') or DEFAULT_PARAMS
 
 def train():
     print("🚀 Starting AI Training Session...")
     
-    if not os.path.exists(DATA_FILE):
-        print(f"❌ Error: {DATA_FILE} not found!")
-        return
-
-    # 1. Load Data
+    # 1. Load Data (deduplicated training store, one row per match)
     try:
-        df = pd.read_csv(DATA_FILE)
+        df = get_training_store().to_dataframe()
         print(f"✅ Loaded {len(df)} matches from history.")
     except Exception as e:
-        print(f"❌ Failed to load CSV: {e}")
+        print(f"❌ Failed to load training data: {e}")
+        return
+    if df.empty:
+        print("❌ Error: no training samples yet!")
         return
 
     # 2. Preprocessing
     # We need to convert categorical text (League) into numbers
     # And ensure our target (won/lost) is 1/0
     
+    seq = int(df['seq'].max())
+
     # Target Variable
-    df = df[df['result'].isin(['won', 'lost'])] # Filter valid results
-    df['target'] = df['result'].apply(lambda x: 1 if x == 'won' else 0)
+    df = time_ordered(labelled(df)) # Filter valid results, oldest first
     
     # Feature Engineering
     # Input Features: League, Home Odds, Away Odds, Confidence
@@ -42,17 +107,18 @@ def train():
     df['league_code'] = le.fit_transform(df['league'])
     
     # Select Features for Training
-    X = df[['league_code', 'home_odds', 'away_odds', 'confidence']]
+    X = df[FEATURES]
     y = df['target']
     
     print(f"📊 Training on {len(df)} validated samples...")
     
-    # 3. Train Test Split
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    # 3. Train Test Split (the newest 20% is held out, never a random mix of past and future)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, shuffle=False)
     
     # 4. Model Initialization (Random Forest)
-    # n_estimators=100 (100 trees), max_depth=10 (prevent overfitting)
-    rf = RandomForestClassifier(n_estimators=100, max_depth=10, random_state=42)
+    # DEFAULT_PARAMS: n_estimators=100 (100 trees), max_depth=10 (prevent overfitting)
+    params = model_params()
+    rf = RandomForestClassifier(random_state=RANDOM_STATE, **params)
     
     # 5. Training
     rf.fit(X_train, y_train)
@@ -66,12 +132,162 @@ def train():
     print("------------------------------------------------")
     print(classification_report(y_test, y_pred))
     
-    # 7. Save Artifacts
+    # 7. Refit on every sample: the watermark below covers the held-out newest 20% too,
+    # so --incremental would never see them again
+    rf.fit(X, y)
+    
+    # 8. Save Artifacts
     joblib.dump(rf, MODEL_FILE)
     joblib.dump(le, ENCODER_FILE)
     print(f"💾 Model saved to {MODEL_FILE}")
     print(f"💾 Encoder saved to {ENCODER_FILE}")
+    save_checkpoint(seq, rf, le, len(X), params)
+    print(f"💾 Checkpoint saved to {CHECKPOINT_FILE} (watermark: seq {seq})")
     print("\n✅ AI System is ready for integration!")
 
+def train_incremental(trees_per_update=TREES_PER_UPDATE, max_trees=MAX_TREES, min_new=MIN_NEW_SAMPLES):
+    """
+    Updates the saved forest with the samples stored or changed since the checkpoint
+    watermark (training_samples.seq): warm_start adds `trees_per_update` trees fitted
+    on the new labelled rows only. Falls back to a full train() when there is no
+    (seq) checkpoint, the store was reset, a new league appears (encoder changes)
+    or the forest would exceed max_trees.
+    """
+    checkpoint = load_checkpoint()
+    if not checkpoint or not os.path.exists(MODEL_FILE) or not os.path.exists(ENCODER_FILE):
+        print("ℹ️ Checkpoint yok, tam eğitim yapılıyor...")
+        return train()
+    if 'seq' not in checkpoint:
+        print("ℹ️ Checkpoint eski CSV satır watermark'ı kullanıyor, tam eğitim yapılıyor...")
+        return train()
+
+    store = get_training_store()
+    seq = checkpoint['seq']
+    new_rows = store.to_dataframe(since_seq=seq)
+    if new_rows.empty:
+        if store.max_seq() < seq:
+            print("⚠️ Eğitim verisi sıfırlanmış, tam eğitim yapılıyor...")
+            return train()
+        print("✅ Yeni veri yok, model güncel.")
+        return checkpoint
+
+    new = labelled(new_rows)
+    if len(new) < min_new or new['target'].nunique() < 2:
+        # Leave the watermark: the rows are used once enough have accumulated
+        print(f"⏳ {len(new)} yeni etiketli satır, güncelleme için en az {min_new} (iki sınıf) gerekli.")
+        return checkpoint
+
+    le = joblib.load(ENCODER_FILE)
+    unseen = set(new['league']) - set(le.classes_)
+    if unseen:
+        print(f"🆕 Yeni ligler ({', '.join(sorted(map(str, unseen)))}), tam eğitim yapılıyor...")
+        return train()
+
+    rf = joblib.load(MODEL_FILE)
+    if rf.n_estimators + trees_per_update > max_trees:
+        print(f"🌲 Ağaç sınırı ({max_trees}) aşılıyor, tam eğitim yapılıyor...")
+        return train()
+
+    new['league_code'] = le.transform(new['league'])
+    rf.set_params(warm_start=True, n_estimators=rf.n_estimators + trees_per_update)
+    rf.fit(new[FEATURES], new['target'])
+    rf.set_params(warm_start=False)
+
+    joblib.dump(rf, MODEL_FILE)
+    checkpoint = save_checkpoint(new_rows['seq'].max(), rf, le, checkpoint.get('samples', 0) + len(new),
+                                 checkpoint.get('params'))
+    print(f"✅ Model güncellendi: +{trees_per_update} ağaç ({rf.n_estimators} toplam), "
+          f"{len(new)} yeni örnek, watermark seq {checkpoint['seq']}")
+    return checkpoint
+
+# Fold matrices of the current search, set once per worker process by _init_folds
+_FOLDS = None
+
+def _init_folds(folds):
+    global _FOLDS
+    _FOLDS = folds
+
+def _evaluate(params, fold):
+    """(accuracy, log-loss, fit seconds) of one grid point on one cached fold."""
+    X_train, y_train, X_test, y_test = _FOLDS[fold]
+    start = time.perf_counter()
+    rf = RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1, **params).fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    classes = list(rf.classes_)
+    p_win = rf.predict_proba(X_test)[:, classes.index(1)] if 1 in classes else np.zeros(len(X_test))
+    acc = accuracy_score(y_test, (p_win >= 0.5).astype(int))
+    loss = log_loss(y_test, np.clip(p_win, 1e-6, 1 - 1e-6), labels=[0, 1])
+    return acc, loss, fit_seconds
+
+def search(jobs=None, n_folds=CV_FOLDS, grid=SEARCH_GRID):
+    """
+    Time-ordered cross-validation over `grid`, one (params, fold) task per process
+    slot. The fold matrices are built once and handed to each worker at start-up.
+    Reports mean accuracy, log-loss and fit time per grid point, then retrains the
+    lowest log-loss settings on all samples and saves model, encoder and checkpoint.
+    """
+    print("🔎 Starting hyperparameter search...")
+    df = get_training_store().to_dataframe()
+    if df.empty:
+        print("❌ Error: no training samples yet!")
+        return
+    seq = int(df['seq'].max())
+    df = time_ordered(labelled(df))
+    if len(df) < n_folds * 10 or df['target'].nunique() < 2:
+        print(f"❌ Not enough labelled samples for {n_folds}-fold CV ({len(df)}).")
+        return
+
+    le = LabelEncoder()
+    df['league_code'] = le.fit_transform(df['league'])
+    X = df[FEATURES].to_numpy(dtype=np.float64)
+    y = df['target'].to_numpy()
+    folds = [(X[tr], y[tr], X[te], y[te]) for tr, te in TimeSeriesSplit(n_splits=n_folds).split(X)]
+
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    jobs = jobs or os.cpu_count() or 1
+    print(f"📊 {len(df)} samples, {len(configs)} settings x {n_folds} folds on {jobs} processes...")
+
+    start = time.perf_counter()
+    scores = [[] for _ in configs]
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_folds, initargs=(folds,)) as pool:
+        tasks = {pool.submit(_evaluate, params, f): i for i, params in enumerate(configs) for f in range(n_folds)}
+        for task, i in tasks.items():
+            scores[i].append(task.result())
+    elapsed = time.perf_counter() - start
+
+    results = []
+    for params, runs in zip(configs, scores):
+        acc, loss, fit_seconds = (float(np.mean(col)) for col in zip(*runs))
+        results.append({'params': params, 'accuracy': acc, 'log_loss': loss, 'fit_seconds': fit_seconds})
+    results.sort(key=lambda r: (r['log_loss'], -r['accuracy']))
+
+    print("\n------------------------------------------------")
+    print(f"{'Settings':<52}{'Acc':>8}{'LogLoss':>9}{'Fit s':>8}")
+    for r in results:
+        label = ", ".join(f"{k}={v}" for k, v in r['params'].items())
+        print(f"{label:<52}{r['accuracy'] * 100:>7.2f}%{r['log_loss']:>9.4f}{r['fit_seconds']:>8.3f}")
+    print("------------------------------------------------")
+    print(f"⏱️ Search took {elapsed:.1f}s")
+
+    best = results[0]
+    print(f"🏆 BEST: {best['params']} (accuracy {best['accuracy'] * 100:.2f}%, log-loss {best['log_loss']:.4f})")
+    rf = RandomForestClassifier(random_state=RANDOM_STATE, **best['params'])
+    rf.fit(df[FEATURES], df['target'])
+    joblib.dump(rf, MODEL_FILE)
+    joblib.dump(le, ENCODER_FILE)
+    save_checkpoint(seq, rf, le, len(df), best['params'])
+    print(f"💾 Best model saved to {MODEL_FILE} / {ENCODER_FILE}")
+    return results
+
 if __name__ == "__main__":
-    train()
+    # python train_model.py --incremental  -> only samples stored since the last checkpoint
+    # python train_model.py --search [--jobs N]  -> time-ordered CV grid search, saves the best
+    multiprocessing.freeze_support()
+    if "--search" in sys.argv:
+        jobs = int(sys.argv[sys.argv.index("--jobs") + 1]) if "--jobs" in sys.argv else None
+        search(jobs)
+    elif "--incremental" in sys.argv:
+        train_incremental()
+    else:
+        train()
@@ -0,0 +1,209 @@
+import csv
+import hashlib
+import os
+import sys
+import threading
+
+# Labelled matches for the AI model: one row per match in the training_samples table
+# of kahin_data.db. `seq` is a store-wide change counter; a row gets a new seq when it
+# is inserted or its values change, so "seq > watermark" is exactly what a model has
+# not seen yet (train_model.py --incremental).
+LEGACY_CSV = "training_data.csv"
+COLUMNS = ('match_id', 'seq', 'kickoff', 'sport', 'league', 'home', 'away', 'home_odds', 'away_odds',
+           'prediction', 'confidence', 'result', 'h_score', 'a_score')
+# Header of the old append-only CSV; export_csv keeps it ('date' now holds the kickoff)
+CSV_HEADERS = ("date", "league", "home", "away", "home_odds", "away_odds", "prediction",
+               "confidence", "result", "h_score", "a_score")
+LABELS = ('won', 'lost')
+
+
+def _float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def reasoning_confidence(reasoning):
+    """Confidence as save_training_data always read it: the number after the first '%'."""
+    try:
+        if "%" in reasoning:
+            return int(reasoning.split('%')[1].split(' ')[0])
+    except (ValueError, IndexError):
+        pass
+    return 0
+
+
+def sample_from_match(m):
+    """training_samples row (dict) for a completed won/lost match, else None."""
+    if m.get('status') != 'Completed' or m.get('result') not in LABELS:
+        return None
+    score = str(m.get('score') or '')
+    h_score, a_score = score.split('-', 1) if '-' in score else (0, 0)
+    odds = m.get('odds') or {}
+    return {
+        'match_id': str(m['id']),
+        'kickoff': m.get('kickoff') or '',
+        'sport': m.get('sport') or '',
+        'league': m.get('league'),
+        'home': m.get('home'),
+        'away': m.get('away'),
+        'home_odds': _float(odds.get('home')),
+        'away_odds': _float(odds.get('away')),
+        'prediction': m.get('recommendation'),
+        'confidence': reasoning_confidence(m.get('reasoning') or ''),
+        'result': m['result'],
+        'h_score': _int(h_score),
+        'a_score': _int(a_score),
+    }
+
+
+def legacy_key(row):
+    """Stable id for an old CSV row (it had none): the same game logged twice maps to one key."""
+    parts = (row.get('league'), row.get('home'), row.get('away'), row.get('h_score'), row.get('a_score'),
+             row.get('home_odds'), row.get('away_odds'))
+    return "csv:" + hashlib.sha1("|".join(str(p) for p in parts).encode('utf-8')).hexdigest()[:16]
+
+
+class TrainingStore:
+    """
+    Deduplicated training data keyed by match id. upsert() only touches rows whose
+    values changed, so re-saving the 3-day history window every cycle is a no-op.
+    The old training_data.csv is imported once (meta training_csv_imported).
+    """
+    _VALUE_COLUMNS = COLUMNS[2:]
+
+    def __init__(self, db=None, legacy_csv=LEGACY_CSV):
+        if db is None:
+            from db_manager import db_manager as db
+        self.db = db
+        with self.db._get_connection() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS training_samples (
+                    match_id TEXT PRIMARY KEY,
+                    seq INTEGER NOT NULL,
+                    kickoff TEXT,
+                    sport TEXT,
+                    league TEXT,
+                    home TEXT,
+                    away TEXT,
+                    home_odds REAL,
+                    away_odds REAL,
+                    prediction TEXT,
+                    confidence INTEGER,
+                    result TEXT,
+                    h_score INTEGER,
+                    a_score INTEGER
+                ) WITHOUT ROWID
+            """)
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_training_samples_seq ON training_samples (seq)")
+        if legacy_csv and self.db.get_meta('training_csv_imported') is None and os.path.exists(legacy_csv):
+            imported = self.import_csv(legacy_csv)
+            print(f"📥 {legacy_csv} içe aktarıldı: {imported} tekil örnek")
+
+    def upsert(self, samples):
+        """Inserts/updates sample dicts (see sample_from_match). Returns the rows that changed."""
+        cols = ", ".join(self._VALUE_COLUMNS)
+        values = ", ".join(f":{c}" for c in self._VALUE_COLUMNS)
+        updates = ", ".join(f"{c}=excluded.{c}" for c in self._VALUE_COLUMNS)
+        old = ", ".join(f"training_samples.{c}" for c in self._VALUE_COLUMNS)
+        new = ", ".join(f"excluded.{c}" for c in self._VALUE_COLUMNS)
+        with self.db._get_connection() as conn:
+            before = conn.total_changes
+            conn.executemany(f"""
+                INSERT INTO training_samples (match_id, seq, {cols})
+                VALUES (:match_id, (SELECT COALESCE(MAX(seq), 0) + 1 FROM training_samples), {values})
+                ON CONFLICT(match_id) DO UPDATE SET seq=excluded.seq, {updates}
+                WHERE ({old}) IS NOT ({new})
+            """, samples)
+            return conn.total_changes - before
+
+    def save_matches(self, matches):
+        """Stores every completed won/lost match of a scrape. Returns the rows that changed."""
+        return self.upsert([s for s in map(sample_from_match, matches) if s])
+
+    def import_csv(self, path=LEGACY_CSV):
+        """One-time import of the old append-only CSV; duplicate lines collapse to one sample."""
+        samples = []
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                if row.get('result') not in LABELS:
+                    continue
+                samples.append({
+                    'match_id': legacy_key(row),
+                    'kickoff': '',  # the old 'date' column held the status text ("FT", "Bitti")
+                    'sport': '',
+                    'league': row.get('league'),
+                    'home': row.get('home'),
+                    'away': row.get('away'),
+                    'home_odds': _float(row.get('home_odds')),
+                    'away_odds': _float(row.get('away_odds')),
+                    'prediction': row.get('prediction'),
+                    'confidence': _int(row.get('confidence')) or 0,
+                    'result': row['result'],
+                    'h_score': _int(row.get('h_score')),
+                    'a_score': _int(row.get('a_score')),
+                })
+        self.upsert(samples)
+        self.db.set_meta('training_csv_imported', len(samples))
+        return len({s['match_id'] for s in samples})
+
+    def max_seq(self):
+        return self.db._get_read_connection().execute(
+            "SELECT COALESCE(MAX(seq), 0) FROM training_samples").fetchone()[0]
+
+    def __len__(self):
+        return self.db._get_read_connection().execute("SELECT COUNT(*) FROM training_samples").fetchone()[0]
+
+    def rows(self, since_seq=0):
+        """Sample tuples (COLUMNS order) with seq > since_seq, oldest change first."""
+        return self.db._get_read_connection().execute(
+            f"SELECT {', '.join(COLUMNS)} FROM training_samples WHERE seq > ? ORDER BY seq",
+            (int(since_seq),)).fetchall()
+
+    def to_dataframe(self, since_seq=0):
+        """pandas DataFrame of rows(since_seq) for training and reports."""
+        import pandas as pd
+        return pd.DataFrame.from_records(self.rows(since_seq), columns=COLUMNS)
+
+    def export_csv(self, path):
+        """Writes the store in the old training_data.csv layout. Returns the row count."""
+        rows = self.rows()
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(CSV_HEADERS)
+            for r in rows:
+                m = dict(zip(COLUMNS, r))
+                writer.writerow([m['kickoff']] + [m[c] for c in CSV_HEADERS[1:]])
+        return len(rows)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_training_store():
+    """Shared TrainingStore on kahin_data.db, created (and the CSV imported) on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TrainingStore()
+    return _store
+
+
+if __name__ == "__main__":
+    # python training_store.py export [path]  -> CSV snapshot of the deduplicated samples
+    store = get_training_store()
+    if len(sys.argv) > 1 and sys.argv[1] == "export":
+        path = sys.argv[2] if len(sys.argv) > 2 else "training_export.csv"
+        print(f"💾 {store.export_csv(path)} örnek {path} dosyasına yazıldı")
+    else:
+        print(f"📊 {len(store)} örnek, son seq {store.max_seq()}")